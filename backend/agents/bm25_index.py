@@ -0,0 +1,102 @@
+"""
+Okapi BM25 over a precomputed sparse term-document matrix.
+
+Produces the same scores as rank_bm25.BM25Okapi (same k1, b and epsilon handling of
+negative IDFs), but scoring a query is one sparse vector-matrix product instead of a
+Python loop over the corpus for every query term.
+"""
+from collections import Counter
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# Upper bound on dense score cells materialized at once by best_matches
+MAX_DENSE_CELLS = 8_000_000
+
+class SparseBM25:
+    def __init__(self, tokenized_corpus, k1=1.5, b=0.75, epsilon=0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.corpus_size = len(tokenized_corpus)
+
+        vocab = {}
+        doc_ids, term_ids, term_freqs = [], [], []
+        doc_len = np.zeros(self.corpus_size, dtype=np.float64)
+        for doc_id, document in enumerate(tokenized_corpus):
+            doc_len[doc_id] = len(document)
+            for word, freq in Counter(document).items():
+                doc_ids.append(doc_id)
+                term_ids.append(vocab.setdefault(word, len(vocab)))
+                term_freqs.append(freq)
+        self.vocab = vocab
+        self.doc_len = doc_len
+        self.avgdl = doc_len.sum() / self.corpus_size
+
+        # IDF exactly as BM25Okapi: negative values are floored to epsilon * average idf
+        doc_freq = np.bincount(np.asarray(term_ids, dtype=np.int64), minlength=len(vocab)).astype(np.float64)
+        idf = np.log(self.corpus_size - doc_freq + 0.5) - np.log(doc_freq + 0.5)
+        self.average_idf = idf.sum() / len(idf) if len(idf) else 0.0
+        idf[idf < 0] = self.epsilon * self.average_idf
+        self.idf = idf
+
+        # Per-cell BM25 weight: idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))
+        tf = np.asarray(term_freqs, dtype=np.float64)
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        length_norm = self.k1 * (1 - self.b + self.b * doc_len / self.avgdl)
+        weights = idf[term_ids] * (tf * (self.k1 + 1) / (tf + length_norm[doc_ids]))
+        self.term_doc = csr_matrix(
+            (weights, (term_ids, doc_ids)),
+            shape=(len(vocab), self.corpus_size),
+            dtype=np.float64
+        )
+
+    def _query_matrix(self, queries):
+        """Sparse (n_queries x vocab) matrix of query term counts."""
+        rows, cols, counts = [], [], []
+        for row, query_tokens in enumerate(queries):
+            for word, count in Counter(query_tokens).items():
+                term_id = self.vocab.get(word)
+                if term_id is not None:
+                    rows.append(row)
+                    cols.append(term_id)
+                    counts.append(count)
+        return csr_matrix((counts, (rows, cols)), shape=(len(queries), len(self.vocab)), dtype=np.float64)
+
+    def get_scores(self, query_tokens):
+        """BM25 score of every document for one tokenized query."""
+        return self.get_batch_scores([query_tokens])[0]
+
+    def get_batch_scores(self, queries):
+        """Dense (n_queries x corpus_size) BM25 scores for tokenized queries."""
+        return (self._query_matrix(queries) @ self.term_doc).toarray()
+
+    def top_k(self, query_tokens, k=5):
+        """Return (indices, scores) of the k best documents, highest score first."""
+        scores = self.get_scores(query_tokens)
+        k = min(k, self.corpus_size)
+        if k <= 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+        if k < self.corpus_size:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(self.corpus_size)
+        # Ties break on document order, like np.argmax
+        order = np.lexsort((candidates, -scores[candidates]))
+        indices = candidates[order]
+        return indices, scores[indices]
+
+    def best_matches(self, queries):
+        """Return (indices, scores) of the best document for each tokenized query."""
+        queries = list(queries)
+        query_matrix = self._query_matrix(queries)
+        chunk_size = max(1, MAX_DENSE_CELLS // max(self.corpus_size, 1))
+        indices = np.zeros(len(queries), dtype=np.int64)
+        scores = np.zeros(len(queries), dtype=np.float64)
+        for start in range(0, len(queries), chunk_size):
+            dense = (query_matrix[start:start + chunk_size] @ self.term_doc).toarray()
+            best = np.argmax(dense, axis=1)
+            indices[start:start + chunk_size] = best
+            scores[start:start + chunk_size] = dense[np.arange(len(best)), best]
+        return indices, scores
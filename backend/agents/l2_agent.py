@@ -1,24 +1,18 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.ensemble import RandomForestClassifier
-from rank_bm25 import BM25Okapi
 from collections import Counter
 from langchain_openai import AzureOpenAIEmbeddings, AzureChatOpenAI
 from langchain.docstore.document import Document
-from langchain_community.vectorstores import FAISS
+from agents.embedding_cache import CachedEmbeddings
+from agents.l2_training import load_or_train_artifacts
+from agents.resolution_cache import ResolutionCache
+from agents.vector_index import ResolvedTicketIndex
 from core.config import settings
 from utils.logger import logger
-import json
-import re
-from langchain_core.tools import tool
-from langgraph.prebuilt import create_react_agent
+from pydantic import BaseModel, Field
 from concurrent.futures import ThreadPoolExecutor
+import contextvars
 import traceback
-import os
 
 # Azure models
 model = AzureChatOpenAI(
@@ -27,59 +21,43 @@ model = AzureChatOpenAI(
     api_version=settings.AZURE_OPENAI_API_VERSION,
     temperature=0
 )
-embedding_model = AzureOpenAIEmbeddings(
-    model=settings.AZURE_OPENAI_EMBED_MODEL,
-    azure_endpoint=settings.AZURE_OPENAI_EMBED_API_ENDPOINT,
-    api_key=settings.AZURE_OPENAI_EMBED_API_KEY,
-    api_version=settings.AZURE_OPENAI_EMBED_VERSION
+# Embeddings go through a persistent cache so repeated text never hits Azure twice
+embedding_model = CachedEmbeddings(
+    AzureOpenAIEmbeddings(
+        model=settings.AZURE_OPENAI_EMBED_MODEL,
+        azure_endpoint=settings.AZURE_OPENAI_EMBED_API_ENDPOINT,
+        api_key=settings.AZURE_OPENAI_EMBED_API_KEY,
+        api_version=settings.AZURE_OPENAI_EMBED_VERSION
+    ),
+    model_name=settings.AZURE_OPENAI_EMBED_MODEL,
+    path=settings.EMBEDDING_CACHE_PATH,
+    max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES
 )
 
-# Load and preprocess dataset
+# Load pre-trained artifacts (see agents/l2_training.py)
 try:
-    df = pd.read_excel(r'./training/test_excel.xlsx', sheet_name='Detail')
-    df['Reported Issue'] = df['Reported Issue'].fillna('')
-    df['Resolution provided'] = df['Resolution provided'].fillna('')
-    tokenized_corpus = [doc.split() for doc in df['Reported Issue'].tolist()]
-    bm25 = BM25Okapi(tokenized_corpus)
-    logger.info("Loaded and preprocessed training data successfully")
+    artifact_key, artifacts = load_or_train_artifacts()
+    df = artifacts["df"]
+    bm25 = artifacts["bm25"]
+    priority_pipeline = artifacts["priority_pipeline"]
+    team_pipeline = artifacts["team_pipeline"]
+    logger.info(f"Loaded L2 model artifacts {artifact_key}")
 except Exception as e:
-    logger.error(f"Failed to load training data: {str(e)}\n{traceback.format_exc()}")
+    logger.error(f"Failed to load L2 model artifacts: {str(e)}\n{traceback.format_exc()}")
     raise
 
-# Features and targets
-features = ['Reported Issue', 'Resolution provided']
-targets = ['Priority', 'Classified Team']
-X = df[features]
-y_priority = df['Priority']
-y_team = df['Classified Team']
-
-# Split dataset
-X_train, X_test, y_pri_train, y_pri_test = train_test_split(X, y_priority, test_size=0.2, random_state=42)
-X_train, X_test, y_team_train, y_team_test = train_test_split(X, y_team, test_size=0.2, random_state=42)
-
-# Preprocessing pipeline
-preprocessor = ColumnTransformer(
-    transformers=[
-        ('text_issue', TfidfVectorizer(max_features=100), 'Reported Issue'),
-        ('text_resolution', TfidfVectorizer(max_features=100), 'Resolution provided'),
-    ])
-priority_pipeline = Pipeline([
-    ('preprocessor', preprocessor),
-    ('classifier', RandomForestClassifier(n_estimators=100, random_state=42))
-])
-team_pipeline = Pipeline([
-    ('preprocessor', preprocessor),
-    ('classifier', RandomForestClassifier(n_estimators=100, random_state=42))
-])
-
-# Train models
-priority_pipeline.fit(X_train, y_pri_train)
-team_pipeline.fit(X_train, y_team_train)
-logger.info("Trained ML pipelines successfully")
+# Predictions are only reused for the artifacts that produced them
+resolution_cache = ResolutionCache(
+    artifact_key,
+    max_entries=settings.RESOLUTION_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESOLUTION_CACHE_TTL_SECONDS,
+    near_duplicates=settings.RESOLUTION_CACHE_NEAR_DUPLICATES,
+    similarity_threshold=settings.RESOLUTION_CACHE_SIMILARITY_THRESHOLD
+)
 
-# Create or load FAISS vector store with resolution in metadata
-try:
-    documents = [
+# Create or load FAISS vector store with resolution in metadata; resolved tickets are appended incrementally
+def build_documents():
+    return [
         Document(
             page_content=row["Reported Issue"],
             metadata={
@@ -89,20 +67,26 @@ try:
             }
         ) for _, row in df.iterrows()
     ]
-    persistent_directory = "./faiss_sample_db"
-    if os.path.exists(persistent_directory):
-        logger.info(f"Loading existing FAISS vector store from {persistent_directory}")
-        vector_store = FAISS.load_local(persistent_directory, embedding_model, allow_dangerous_deserialization=True)
-        logger.info("Loaded FAISS vector store successfully")
-    else:
-        logger.info(f"Creating new FAISS vector store at {persistent_directory}")
-        vector_store = FAISS.from_documents(documents, embedding_model)
-        vector_store.save_local(persistent_directory)
-        logger.info("Created and saved FAISS vector store successfully")
+
+try:
+    vector_index = ResolvedTicketIndex(
+        base_directory=settings.FAISS_INDEX_DIR,
+        delta_directory=settings.FAISS_DELTA_DIR,
+        embeddings=embedding_model,
+        batch_size=settings.FAISS_INGEST_BATCH_SIZE,
+        compact_after=settings.FAISS_COMPACT_AFTER_DELTAS,
+        delta_retention_seconds=settings.FAISS_DELTA_RETENTION_SECONDS
+    )
+    vector_index.load(build_documents)
+    logger.info(f"FAISS vector store ready, embedding cache: {embedding_model.stats()}")
 except Exception as e:
     logger.error(f"Failed to create or load FAISS vector store: {str(e)}\n{traceback.format_exc()}")
     raise
 
+# Similarity above which an issue counts as already known
+NOVELTY_BM25_THRESHOLD = 8.0
+NOVELTY_RAG_THRESHOLD = 0.6
+
 # Prediction functions
 def weighted_voting(bm25_pred, rf_pred, bm25_score, threshold=0.75):
     if bm25_score >= threshold:
@@ -117,49 +101,73 @@ def weighted_voting(bm25_pred, rf_pred, bm25_score, threshold=0.75):
     })
     return combined_predictions.most_common(1)[0][0]
 
-def hybrid_predict(input_data, bm25_threshold=0.75):
-    try:
-        logger.info(f"Running hybrid_predict with input: {input_data}")
-        input_df = pd.DataFrame([input_data])
-        query_text = input_data['Reported Issue']
-        query_tokens = query_text.split()
-        bm25_scores = bm25.get_scores(query_tokens)
-        best_match_index = np.argmax(bm25_scores)
-        best_match_score = bm25_scores[best_match_index]
+def _hybrid_predict_frame(input_df, bm25_threshold=0.75):
+    """Score every row of input_df with one predict_proba call per pipeline."""
+    priority_probas = priority_pipeline.predict_proba(input_df)
+    team_probas = team_pipeline.predict_proba(input_df)
+    # Same as Pipeline.predict for a forest: the class with the highest probability
+    rf_priorities = priority_pipeline.classes_.take(np.argmax(priority_probas, axis=1), axis=0)
+    rf_teams = team_pipeline.classes_.take(np.argmax(team_probas, axis=1), axis=0)
+    
+    # One sparse product scores every query against the corpus
+    best_indices, best_scores = bm25.best_matches(
+        [query_text.split() for query_text in input_df['Reported Issue']]
+    )
+    
+    results = []
+    for i, (best_match_index, best_match_score) in enumerate(zip(best_indices, best_scores)):
         most_similar_ticket = df.iloc[best_match_index]
         
         bm25_priority = most_similar_ticket['Priority']
         bm25_team = most_similar_ticket['Classified Team']
         resolution_ml = most_similar_ticket['Resolution provided']
-        rf_priority = priority_pipeline.predict(input_df)[0]
-        rf_team = team_pipeline.predict(input_df)[0]
         
-        final_priority = weighted_voting(bm25_priority, rf_priority, best_match_score, bm25_threshold)
-        final_team = weighted_voting(bm25_team, rf_team, best_match_score, bm25_threshold)
+        final_priority = weighted_voting(bm25_priority, rf_priorities[i], best_match_score, bm25_threshold)
+        final_team = weighted_voting(bm25_team, rf_teams[i], best_match_score, bm25_threshold)
         
-        priority_proba = priority_pipeline.predict_proba(input_df)[0]
-        priority_conf = priority_proba[np.where(priority_pipeline.classes_ == final_priority)[0][0]]
-        team_proba = team_pipeline.predict_proba(input_df)[0]
-        team_conf = team_proba[np.where(team_pipeline.classes_ == final_team)[0][0]]
+        priority_conf = priority_probas[i][np.where(priority_pipeline.classes_ == final_priority)[0][0]]
+        team_conf = team_probas[i][np.where(team_pipeline.classes_ == final_team)[0][0]]
         
-        result = {
+        results.append({
             'Priority': str(final_priority),
             'Classified Team': str(final_team),
             'Priority Confidence': float(priority_conf),
             'Team Confidence': float(team_conf),
             'BM25 Similarity Score': float(best_match_score),
             'Resolution': resolution_ml
-        }
+        })
+    return results
+
+def hybrid_predict(input_data, bm25_threshold=0.75):
+    try:
+        logger.info(f"Running hybrid_predict with input: {input_data}")
+        result = _hybrid_predict_frame(pd.DataFrame([input_data]), bm25_threshold)[0]
         logger.info(f"Hybrid predict result: {result}")
         return result
     except Exception as e:
         logger.error(f"Error in hybrid_predict: {str(e)}\n{traceback.format_exc()}")
         raise
 
+def hybrid_predict_batch(reported_issues, bm25_threshold=0.75):
+    """Run hybrid_predict over many reported issues, transforming them in one pass."""
+    try:
+        reported_issues = list(reported_issues)
+        logger.info(f"Running hybrid_predict_batch for {len(reported_issues)} issues")
+        if not reported_issues:
+            return []
+        input_df = pd.DataFrame({
+            'Reported Issue': reported_issues,
+            'Resolution provided': [''] * len(reported_issues)
+        })
+        return _hybrid_predict_frame(input_df, bm25_threshold)
+    except Exception as e:
+        logger.error(f"Error in hybrid_predict_batch: {str(e)}\n{traceback.format_exc()}")
+        raise
+
 def rag_predict(reported_issue, k=5):
     try:
         logger.info(f"Running rag_predict for: {reported_issue}")
-        results = vector_store.similarity_search_with_score(reported_issue, k=k)
+        results = vector_index.search(reported_issue, k=k)
         if results:
             most_similar_doc, max_similarity = results[0]
             resolution_rag = most_similar_doc.metadata["Resolution"]
@@ -206,142 +214,82 @@ def combine_predictions(ml_pred, rag_pred):
             final_pred[field] = ml_value if ml_conf > rag_conf else rag_value
     return final_pred
 
-@tool
-def run_ml_prediction(reported_issue: str) -> str:
-    """Run ML-based prediction (Random Forest + BM25) for a reported issue."""
-    try:
-        input_data = {'Reported Issue': reported_issue, 'Resolution provided': ''}
-        result = hybrid_predict(input_data)
-        return json.dumps(result)
-    except Exception as e:
-        logger.error(f"Error in run_ml_prediction: {str(e)}\n{traceback.format_exc()}")
-        raise
-
-@tool
-def run_rag_prediction(reported_issue: str) -> str:
-    """Run RAG-based prediction (FAISS vector search) for a reported issue."""
-    try:
-        result = rag_predict(reported_issue)
-        return json.dumps(result)
-    except Exception as e:
-        logger.error(f"Error in run_rag_prediction: {str(e)}\n{traceback.format_exc()}")
-        raise
-
-@tool
-def combine_ml_rag_predictions(ml_result: str, rag_result: str) -> str:
-    """Combine ML and RAG predictions based on confidence scores."""
-    try:
-        ml_pred = json.loads(ml_result)
-        rag_pred = json.loads(rag_result)
-        final_pred = combine_predictions(ml_pred, rag_pred)
-        return json.dumps(final_pred)
-    except Exception as e:
-        logger.error(f"Error in combine_ml_rag_predictions: {str(e)}\n{traceback.format_exc()}")
-        raise
+def is_new_issue(ml_pred, rag_pred):
+    """An issue is new unless BM25 or the vector search found a close historical match."""
+    sim_ml = ml_pred['BM25 Similarity Score']
+    sim_rag = rag_pred['Max Cosine Similarity']
+    return not (sim_ml >= NOVELTY_BM25_THRESHOLD or sim_rag >= NOVELTY_RAG_THRESHOLD)
 
-@tool
-def decide_issue_novelty(ml_result: str, rag_result: str) -> str:
-    """Decide if the issue is new based on similarity scores."""
-    try:
-        ml_pred = json.loads(ml_result)
-        rag_pred = json.loads(rag_result)
-        sim_ml = ml_pred['BM25 Similarity Score']
-        sim_rag = rag_pred['Max Cosine Similarity']
-        is_new = not (sim_ml >= 8.0 or sim_rag >= 0.6)
-        return json.dumps({"is_new_issue": is_new})
-    except Exception as e:
-        logger.error(f"Error in decide_issue_novelty: {str(e)}\n{traceback.format_exc()}")
-        raise
-
-@tool
-def run_parallel_predictions(reported_issue: str) -> str:
+def run_parallel_predictions(reported_issue):
     """Run ML and RAG predictions in parallel for efficiency."""
     try:
+        # Each task runs in a copy of this context so node telemetry still sees its calls
         with ThreadPoolExecutor(max_workers=2) as executor:
-            future_ml = executor.submit(hybrid_predict, {'Reported Issue': reported_issue, 'Resolution provided': ''})
-            future_rag = executor.submit(rag_predict, reported_issue)
+            future_ml = executor.submit(
+                contextvars.copy_context().run, hybrid_predict, {'Reported Issue': reported_issue, 'Resolution provided': ''}
+            )
+            future_rag = executor.submit(contextvars.copy_context().run, rag_predict, reported_issue)
             ml_result = future_ml.result()
             rag_result = future_rag.result()
-        result = {"ml_result": ml_result, "rag_result": rag_result}
-        logger.info(f"Parallel predictions result: {result}")
-        return json.dumps(result)
+        logger.info(f"Parallel predictions result: {{'ml_result': {ml_result}, 'rag_result': {rag_result}}}")
+        return ml_result, rag_result
     except Exception as e:
         logger.error(f"Error in run_parallel_predictions: {str(e)}\n{traceback.format_exc()}")
         raise
 
-tools = [
-    run_ml_prediction,
-    run_rag_prediction,
-    combine_ml_rag_predictions,
-    decide_issue_novelty,
-    run_parallel_predictions
-]
-agent_executor = create_react_agent(model, tools=tools)
+class GeneratedResolution(BaseModel):
+    """Resolution for an issue with no close historical match"""
+    resolution: str = Field(description="Resolution tailored to the reported issue")
+
+resolution_llm = model.with_structured_output(GeneratedResolution)
+
+def generate_resolution(reported_issue, ml_pred, rag_pred):
+    """Single structured LLM call that drafts a resolution for a new issue."""
+    prompt = f"""
+    Generate a resolution for this reported issue: '{reported_issue}'.
+    Base it on the ticket description and the following similar resolutions:
+    - ML Resolution (BM25-based): {ml_pred.get("Resolution") or "None"} (Similarity: {ml_pred.get("BM25 Similarity Score", 0.0)})
+    - RAG Resolution (Embedding-based): {rag_pred.get("Resolution") or "None"} (Similarity: {rag_pred.get("Max Cosine Similarity", 0.0)})
+    Ensure the generated resolution is consistent with these examples but tailored to the new issue.
+    """
+    response = resolution_llm.invoke(prompt)
+    return response.resolution
 
 def predict(reported_issue):
+    """Predict Priority, Team and Resolution; only new issues need an LLM call."""
     try:
         logger.info(f"Running predict for issue: {reported_issue}")
-        query = (
-            f"Analyze this reported issue: '{reported_issue}'. "
-            "Use 'run_parallel_predictions' to get ML and RAG results efficiently. "
-            "Then, use 'combine_ml_rag_predictions' to merge the predictions for Priority and Classified Team. "
-            "Use 'decide_issue_novelty' to determine if it's a new issue. "
-            "For known issues, set 'Resolution' to the resolution from RAG if its 'Max Cosine Similarity' >= 0.6, "
-            "else set it to the resolution from ML. "
-            "For new issues, generate a resolution based on the ticket description and the following similar resolutions: "
-            "- ML Resolution (BM25-based): {{ml_resolution}} (Similarity: {{ml_similarity}}) "
-            "- RAG Resolution (Embedding-based): {{rag_resolution}} (Similarity: {{rag_similarity}}) "
-            "Ensure the generated resolution is consistent with these examples but tailored to the new issue. "
-            "Return a JSON object with 'Priority', 'Classified Team', 'Resolution', 'is_new_issue', and 'combined_score'."
-        )
-        # Run parallel predictions to get ML and RAG results
-        parallel_result = json.loads(run_parallel_predictions(reported_issue))
-        ml_pred = parallel_result["ml_result"]
-        rag_pred = parallel_result["rag_result"]
+        if settings.RESOLUTION_CACHE_ENABLED:
+            cached = resolution_cache.get(reported_issue)
+            if cached is not None:
+                logger.info(f"Predict result from cache: {cached}")
+                return cached
+        ml_pred, rag_pred = run_parallel_predictions(reported_issue)
+        final_pred = combine_predictions(ml_pred, rag_pred)
+        is_new = is_new_issue(ml_pred, rag_pred)
         
-        # Extract resolutions and similarity scores
-        ml_resolution = ml_pred.get("Resolution", "")
-        rag_resolution = rag_pred.get("Resolution", "")
-        ml_similarity = ml_pred.get("BM25 Similarity Score", 0.0)
-        rag_similarity = rag_pred.get("Max Cosine Similarity", 0.0)
+        if is_new:
+            resolution = generate_resolution(reported_issue, ml_pred, rag_pred)
+        elif rag_pred.get("Max Cosine Similarity", 0.0) >= NOVELTY_RAG_THRESHOLD:
+            resolution = rag_pred.get("Resolution", "")
+        else:
+            resolution = ml_pred.get("Resolution", "")
         
         # Calculate combined score
         combined_score = (ml_pred["Priority Confidence"] + rag_pred["Priority Confidence"] +
                          ml_pred["Team Confidence"] + rag_pred["Team Confidence"]) / 4
         
-        # Format the query with resolutions
-        formatted_query = query.replace("{{ml_resolution}}", ml_resolution or "None") \
-                              .replace("{{rag_resolution}}", rag_resolution or "None") \
-                              .replace("{{ml_similarity}}", str(ml_similarity)) \
-                              .replace("{{rag_similarity}}", str(rag_similarity))
-        
-        inputs = {"messages": [("user", formatted_query)]}
-        response = agent_executor.invoke(inputs)
-        for msg in response["messages"]:
-            if msg.type == "ai" and msg.content:
-                content = msg.content.strip()
-                json_match = re.search(r'```json\s*(.*?)\s*```', content, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(1)
-                    try:
-                        result = json.loads(json_str)
-                        result["combined_score"] = combined_score
-                        logger.info(f"Predict result: {result}")
-                        return result
-                    except json.JSONDecodeError as e:
-                        logger.error(f"JSON decode error in predict: {str(e)}")
-                        continue
-                else:
-                    try:
-                        result = json.loads(content)
-                        result["combined_score"] = combined_score
-                        logger.info(f"Predict result: {result}")
-                        return result
-                    except json.JSONDecodeError as e:
-                        logger.error(f"JSON decode error in predict: {str(e)}")
-                        continue
-        logger.error("Agent failed to produce valid output")
-        raise ValueError("Agent failed to produce valid output")
+        result = {
+            "Priority": final_pred["Priority"],
+            "Classified Team": final_pred["Classified Team"],
+            "Resolution": resolution,
+            "is_new_issue": is_new,
+            "combined_score": combined_score
+        }
+        logger.info(f"Predict result: {result}")
+        if settings.RESOLUTION_CACHE_ENABLED:
+            resolution_cache.set(reported_issue, result)
+        return result
     except Exception as e:
         logger.error(f"Error in predict: {str(e)}\n{traceback.format_exc()}")
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,182 @@
+"""
+Offline training for the L2 hybrid classifier.
+
+Fitted models are stored as versioned artifacts under L2_ARTIFACT_DIR, keyed by a
+hash of the training file, so workers only load them at startup. Rebuild with:
+
+    python -m agents.l2_training [--training-file PATH] [--force]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import traceback
+import uuid
+from datetime import datetime
+
+import joblib
+import pandas as pd
+import sklearn
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+from agents.bm25_index import SparseBM25
+from core.config import settings
+from utils.logger import logger
+
+# Bump whenever the layout or contents of the artifacts change
+ARTIFACT_VERSION = 2
+ARTIFACT_NAMES = ["df", "bm25", "priority_pipeline", "team_pipeline"]
+MANIFEST_FILE = "manifest.json"
+
+def training_file_hash(path: str) -> str:
+    """Return the sha256 hex digest of the training file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def artifact_key(path: str) -> str:
+    """Key identifying the artifacts built from the given training file."""
+    return f"v{ARTIFACT_VERSION}-{training_file_hash(path)[:16]}"
+
+def artifact_path(key: str) -> str:
+    return os.path.join(settings.L2_ARTIFACT_DIR, key)
+
+def load_training_data(path: str) -> pd.DataFrame:
+    df = pd.read_excel(path, sheet_name='Detail')
+    df['Reported Issue'] = df['Reported Issue'].fillna('')
+    df['Resolution provided'] = df['Resolution provided'].fillna('')
+    return df
+
+def train_artifacts(path: str) -> dict:
+    """Fit the sparse BM25 index and the priority/team pipelines from the training file."""
+    df = load_training_data(path)
+    tokenized_corpus = [doc.split() for doc in df['Reported Issue'].tolist()]
+    bm25 = SparseBM25(tokenized_corpus)
+    logger.info(f"Loaded and preprocessed training data from {path}")
+
+    # Features and targets
+    features = ['Reported Issue', 'Resolution provided']
+    X = df[features]
+    y_priority = df['Priority']
+    y_team = df['Classified Team']
+
+    # Split dataset
+    X_train, X_test, y_pri_train, y_pri_test = train_test_split(X, y_priority, test_size=0.2, random_state=42)
+    X_train, X_test, y_team_train, y_team_test = train_test_split(X, y_team, test_size=0.2, random_state=42)
+
+    # Preprocessing pipeline
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('text_issue', TfidfVectorizer(max_features=100), 'Reported Issue'),
+            ('text_resolution', TfidfVectorizer(max_features=100), 'Resolution provided'),
+        ])
+    priority_pipeline = Pipeline([
+        ('preprocessor', preprocessor),
+        ('classifier', RandomForestClassifier(n_estimators=100, random_state=42))
+    ])
+    team_pipeline = Pipeline([
+        ('preprocessor', preprocessor),
+        ('classifier', RandomForestClassifier(n_estimators=100, random_state=42))
+    ])
+
+    # Train models
+    priority_pipeline.fit(X_train, y_pri_train)
+    team_pipeline.fit(X_train, y_team_train)
+    logger.info("Trained ML pipelines successfully")
+
+    return {
+        "df": df,
+        "bm25": bm25,
+        "priority_pipeline": priority_pipeline,
+        "team_pipeline": team_pipeline
+    }
+
+def save_artifacts(artifacts: dict, key: str, path: str) -> str:
+    """Write the artifacts to a temp directory and atomically move it into place."""
+    target = artifact_path(key)
+    tmp_dir = os.path.join(settings.L2_ARTIFACT_DIR, f".tmp-{key}-{uuid.uuid4().hex[:8]}")
+    os.makedirs(tmp_dir)
+    try:
+        for name in ARTIFACT_NAMES:
+            # Uncompressed dumps so numpy buffers can be memory-mapped on load
+            joblib.dump(artifacts[name], os.path.join(tmp_dir, f"{name}.joblib"))
+        manifest = {
+            "key": key,
+            "artifact_version": ARTIFACT_VERSION,
+            "training_file": os.path.abspath(path),
+            "training_file_sha256": training_file_hash(path),
+            "sklearn_version": sklearn.__version__,
+            "created_at": datetime.utcnow().isoformat()
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+        try:
+            os.rename(tmp_dir, target)
+        except OSError:
+            if not os.path.exists(os.path.join(target, MANIFEST_FILE)):
+                raise
+            # Another process published the same key first
+            logger.info(f"L2 artifacts {key} already published, discarding local copy")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        logger.info(f"Saved L2 artifacts to {target}")
+        return target
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+def load_artifacts(key: str) -> dict:
+    """Load the artifacts for a key, memory-mapping their numpy buffers."""
+    path = artifact_path(key)
+    artifacts = {
+        name: joblib.load(os.path.join(path, f"{name}.joblib"), mmap_mode='r')
+        for name in ARTIFACT_NAMES
+    }
+    logger.info(f"Loaded L2 artifacts from {path}")
+    return artifacts
+
+def build_artifacts(path: str, force: bool = False) -> str:
+    """Train and publish the artifacts for a training file, returning their key."""
+    key = artifact_key(path)
+    if not force and os.path.exists(os.path.join(artifact_path(key), MANIFEST_FILE)):
+        logger.info(f"L2 artifacts {key} are up to date")
+        return key
+    if force and os.path.exists(artifact_path(key)):
+        shutil.rmtree(artifact_path(key))
+    os.makedirs(settings.L2_ARTIFACT_DIR, exist_ok=True)
+    save_artifacts(train_artifacts(path), key, path)
+    return key
+
+def load_or_train_artifacts(path: str = None) -> tuple:
+    """Return (key, artifacts) for the configured training file."""
+    path = path or settings.L2_TRAINING_FILE
+    key = artifact_key(path)
+    if not os.path.exists(os.path.join(artifact_path(key), MANIFEST_FILE)):
+        if not settings.L2_TRAIN_ON_MISSING:
+            raise FileNotFoundError(
+                f"No L2 artifacts for {path} (key {key}); run 'python -m agents.l2_training' first"
+            )
+        logger.warning(f"No L2 artifacts for key {key}, training in-process")
+        build_artifacts(path)
+    return key, load_artifacts(key)
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and publish the L2 model artifacts")
+    parser.add_argument("--training-file", default=settings.L2_TRAINING_FILE)
+    parser.add_argument("--force", action="store_true", help="Retrain even if artifacts already exist")
+    args = parser.parse_args()
+    try:
+        key = build_artifacts(args.training_file, force=args.force)
+        print(f"L2 artifacts ready: {artifact_path(key)}")
+    except Exception as e:
+        logger.error(f"Failed to build L2 artifacts: {str(e)}\n{traceback.format_exc()}")
+        raise
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,30 @@
+import json
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from agents.mail_templates import render_email
 from core.config import settings
+from core.database import db
+from core.models import OutboxEmail
 from utils.logger import logger
 import traceback
 
-def send_email(to_email: str, ticket_id: str, status: str, details: dict = None):
+# One pooled keep-alive session for all Mailgun calls in this process
+session = requests.Session()
+session.auth = ("api", settings.MAILGUN_API_KEY)
+session.verify = False
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=settings.MAIL_HTTP_POOL_SIZE))
+session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=settings.MAIL_HTTP_POOL_SIZE))
+
+# Set whenever a row is queued so the dispatcher does not wait for its next poll
+outbox_ready = threading.Event()
+
+def mailgun_messages_url() -> str:
+    return f"{settings.MAILGUN_API_BASE_URL.rstrip('/')}/{settings.MAILGUN_DOMAIN}/messages"
+
+def enqueue_email(to_email: str, ticket_id: str, status: str, details: dict = None) -> OutboxEmail:
     """
-    Send an email notification to the user via Mailgun based on ticket status.
+    Queue a ticket notification in the outbox; the mail dispatcher delivers it.
     
     Args:
         to_email (str): Recipient's email address
@@ -13,143 +32,75 @@ def send_email(to_email: str, ticket_id: str, status: str, details: dict = None)
         status (str): Current status of the ticket
         details (dict): Additional ticket details (e.g., resolution, priority)
     """
-    try:
-        mailgun_api_key = settings.MAILGUN_API_KEY
-        mailgun_domain = settings.MAILGUN_DOMAIN
-        mailgun_from_email = settings.MAILGUN_FROM_EMAIL
-        mailgun_api_url = f"https://api.mailgun.net/v3/{mailgun_domain}/messages"
-
-        if not mailgun_from_email:
-            logger.error(f"MAILGUN_FROM_EMAIL is not set for ticket {ticket_id}")
-            raise ValueError("MAILGUN_FROM_EMAIL is not configured")
-        
-        logger.debug(f"Sending email for ticket {ticket_id} from {mailgun_from_email} to {to_email}")
-
-        subject = f"Ticket Update: {ticket_id}"
-        details = details or {}
+    email = OutboxEmail(
+        to_email=to_email,
+        ticket_id=ticket_id,
+        status=status,
+        details=details or {}
+    )
+    db.session.add(email)
+    db.session.commit()
+    outbox_ready.set()
+    logger.debug(f"Queued email {email.id} for ticket {ticket_id} to {to_email}, status: {status}")
+    return email
 
-        if status == "l2_processed":
-            text_body = (
-                f"Dear User,\n\n"
-                f"Your ticket {ticket_id} has been processed by our L2 agent.\n\n"
-                f"Priority: {details.get('priority', 'N/A')}\n\n"
-                f"Assigned Team: {details.get('classified_team', 'N/A')}\n\n"
-                f"Resolution suggested: {details.get('resolution', 'N/A')}\n\n"
-                f"Please wait for further updates or provide feedback if requested.\n\n"
-                f"Best regards,\nSupport Team"
-            )
-            html_body = (
-                f"<html><body>"
-                f"<p>Dear User,</p>"
-                f"<p>Your ticket {ticket_id} has been processed by our L2 agent.</p>"
-                f"<p><strong>Priority:</strong> {details.get('priority', 'N/A')}</p>"
-                f"<p><strong>Assigned Team:</strong> {details.get('classified_team', 'N/A')}</p>"
-                f"<p><strong>Resolution suggested:</strong> {details.get('resolution', 'N/A')}</p>"
-                f"<p>Please wait for further updates or provide feedback if requested.</p>"
-                f"<p>Best regards,<br>Support Team</p>"
-                f"</body></html>"
-            )
-        elif status == "l3_processing":
-            text_body = (
-                f"Dear User,\n\n"
-                f"Your ticket {ticket_id} has been escalated to L3 for development-level resolution.\n\n"
-                f"Status: Processing\n\n"
-                f"We will update you once the issue is resolved.\n\n"
-                f"Best regards,\nSupport Team"
-            )
-            html_body = (
-                f"<html><body>"
-                f"<p>Dear User,</p>"
-                f"<p>Your ticket {ticket_id} has been escalated to L3 for development-level resolution.</p>"
-                f"<p><strong>Status:</strong> Processing</p>"
-                f"<p>We will update you once the issue is resolved.</p>"
-                f"<p>Best regards,<br>Support Team</p>"
-                f"</body></html>"
-            )
-        elif status == "l4_escalated":
-            text_body = (
-                f"Dear User,\n\n"
-                f"Your ticket {ticket_id} has been escalated to L4 for human intervention.\n\n"
-                f"Assigned Team: {details.get('classified_team', 'N/A')}\n\n"
-                f"Status: Pending\n\n"
-                f"We will update you once the issue is resolved.\n\n"
-                f"Best regards,\nSupport Team"
-            )
-            html_body = (
-                f"<html><body>"
-                f"<p>Dear User,</p>"
-                f"<p>Your ticket {ticket_id} has been escalated to L4 for human intervention.</p>"
-                f"<p><strong>Assigned Team:</strong> {details.get('classified_team', 'N/A')}</p>"
-                f"<p><strong>Status:</strong> Pending</p>"
-                f"<p>We will update you once the issue is resolved.</p>"
-                f"<p>Best regards,<br>Support Team</p>"
-                f"</body></html>"
-            )
-        elif status == "more_info_needed":
-            text_body = (
-                f"Dear User,\n\n"
-                f"Your ticket {ticket_id} requires additional information to proceed.\n\n"
-                f"Please provide more details via our application.\n\n"
-                f"Best regards,\nSupport Team"
-            )
-            html_body = (
-                f"<html><body>"
-                f"<p>Dear User,</p>"
-                f"<p>Your ticket {ticket_id} requires additional information to proceed.</p>"
-                f"<p>Please provide more details via our application.</p>"
-                f"<p>Best regards,<br>Support Team</p>"
-                f"</body></html>"
-            )
-        elif status == "feedback_needed":
-            text_body = (
-                f"Dear User,\n\n"
-                f"Your ticket {ticket_id} has a proposed resolution: {details.get('resolution', 'N/A')}.\n\n"
-                f"Do tell us if this has resolved your issue via our application.\n\n"
-                f"Best regards,\nSupport Team"
-            )
-            html_body = (
-                f"<html><body>"
-                f"<p>Dear User,</p>"
-                f"<p>Your ticket {ticket_id} has a proposed resolution: <strong>{details.get('resolution', 'N/A')}</strong>.</p>"
-                f"<p>Do tell us if this has resolved your issue via our application.</p>"
-                f"<p>Best regards,<br>Support Team</p>"
-                f"</body></html>"
-            )
-        else:
-            text_body = (
-                f"Dear User,\n\n"
-                f"Your ticket {ticket_id} status has been updated: {status}.\n"
-                f"Please contact support for further details.\n\n"
-                f"Best regards,\nSupport Team"
-            )
-            html_body = (
-                f"<html><body>"
-                f"<p>Dear User,</p>"
-                f"<p>Your ticket {ticket_id} status has been updated: <strong>{status}</strong>.</p>"
-                f"<p>Please contact support for further details.</p>"
-                f"<p>Best regards,<br>Support Team</p>"
-                f"</body></html>"
-            )
-
-        response = requests.post(
-            mailgun_api_url,
-            auth=("api", mailgun_api_key),
-            data={
-                "from": mailgun_from_email,
-                "to": to_email,
-                "subject": subject,
-                "text": text_body,
-                "html": html_body
-            },
-            verify=False
-        )
-
-        if response.status_code == 200:
-            logger.info(f"Email sent to {to_email} for ticket {ticket_id}, status: {status}")
-        else:
-            logger.error(f"Mailgun API error for ticket {ticket_id}: {response.status_code} - {response.text}")
-            raise Exception(f"Mailgun API error: {response.status_code} - {response.text}")
+def _post_message(data: dict):
+    if not settings.MAILGUN_FROM_EMAIL:
+        raise ValueError("MAILGUN_FROM_EMAIL is not configured")
+    response = session.post(
+        mailgun_messages_url(),
+        data={"from": settings.MAILGUN_FROM_EMAIL, **data},
+        timeout=settings.MAIL_HTTP_TIMEOUT_SECONDS
+    )
+    if response.status_code != 200:
+        raise Exception(f"Mailgun API error: {response.status_code} - {response.text}")
+    return response
 
+def send_email(to_email: str, ticket_id: str, status: str, details: dict = None):
+    """
+    Deliver one ticket notification via Mailgun over the pooled session.
+    
+    Args:
+        to_email (str): Recipient's email address
+        ticket_id (str): Ticket ID
+        status (str): Current status of the ticket
+        details (dict): Additional ticket details (e.g., resolution, priority)
+    """
+    try:
+        logger.debug(f"Sending email for ticket {ticket_id} from {settings.MAILGUN_FROM_EMAIL} to {to_email}")
+        subject, text_body, html_body = render_email(ticket_id, status, details)
+        _post_message({
+            "to": to_email,
+            "subject": subject,
+            "text": text_body,
+            "html": html_body
+        })
+        logger.info(f"Email sent to {to_email} for ticket {ticket_id}, status: {status}")
     except Exception as e:
         logger.error(f"Failed to send email for ticket {ticket_id}: {str(e)}\n{traceback.format_exc()}")
-        raise
\ No newline at end of file
+        raise
+
+def send_batch(recipients: list, status: str, details: dict = None):
+    """
+    Deliver the same notification to several recipients in one Mailgun call.
+    
+    Each recipient's ticket id is filled in through Mailgun recipient-variables.
+    
+    Args:
+        recipients (list): (to_email, ticket_id) pairs with distinct emails
+        status (str): Ticket status shared by all recipients
+        details (dict): Ticket details shared by all recipients
+    """
+    try:
+        subject, text_body, html_body = render_email("%recipient.ticket_id%", status, details)
+        _post_message({
+            "to": [to_email for to_email, _ in recipients],
+            "subject": subject,
+            "text": text_body,
+            "html": html_body,
+            "recipient-variables": json.dumps({to_email: {"ticket_id": ticket_id} for to_email, ticket_id in recipients})
+        })
+        logger.info(f"Batch email sent to {len(recipients)} recipients, status: {status}")
+    except Exception as e:
+        logger.error(f"Failed to send batch email for status {status}: {str(e)}\n{traceback.format_exc()}")
+        raise
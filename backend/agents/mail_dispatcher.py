@@ -0,0 +1,102 @@
+"""
+Background sender for the email outbox.
+
+Graph nodes only insert rows into `email_outbox`; this loop claims due rows with
+FOR UPDATE SKIP LOCKED (safe across workers), delivers them over the pooled Mailgun
+session and retries failures with exponential backoff. With MAIL_BATCHING_ENABLED,
+identical notifications to different recipients go out as one Mailgun call.
+"""
+import json
+import traceback
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from agents.mail_agent import outbox_ready, send_batch, send_email
+from core.config import settings
+from core.database import db
+from core.models import OutboxEmail
+from utils.logger import logger
+
+# Mailgun accepts at most 1000 recipients per batch message
+MAX_BATCH_RECIPIENTS = 1000
+
+def _claim_due_emails(limit: int):
+    return (
+        OutboxEmail.query
+        .filter(OutboxEmail.state == "pending", OutboxEmail.next_attempt_at <= datetime.utcnow())
+        .order_by(OutboxEmail.next_attempt_at, OutboxEmail.id)
+        .with_for_update(skip_locked=True)
+        .limit(limit)
+        .all()
+    )
+
+def _group_emails(emails: list):
+    """Split emails into deliveries of one or more rows sharing status and details."""
+    if not settings.MAIL_BATCHING_ENABLED:
+        return [[email] for email in emails]
+    groups = defaultdict(list)
+    for email in emails:
+        groups[(email.status, json.dumps(email.details, sort_keys=True, default=str))].append(email)
+    deliveries = []
+    for group in groups.values():
+        # recipient-variables are keyed by address, so a batch may hold each address once
+        batch, seen = [], set()
+        for email in group:
+            if email.to_email in seen or len(batch) >= MAX_BATCH_RECIPIENTS:
+                deliveries.append(batch)
+                batch, seen = [], set()
+            batch.append(email)
+            seen.add(email.to_email)
+        deliveries.append(batch)
+    return deliveries
+
+def _mark_failed(emails: list, error: str):
+    now = datetime.utcnow()
+    for email in emails:
+        email.attempts += 1
+        email.last_error = error
+        if email.attempts >= settings.MAIL_MAX_ATTEMPTS:
+            email.state = "failed"
+            logger.error(f"Giving up on email {email.id} for ticket {email.ticket_id} after {email.attempts} attempts")
+        else:
+            backoff = settings.MAIL_RETRY_BACKOFF_SECONDS * 2 ** (email.attempts - 1)
+            email.next_attempt_at = now + timedelta(seconds=backoff)
+
+def dispatch_once() -> int:
+    """Deliver one batch of due outbox emails. Returns how many rows were handled."""
+    emails = _claim_due_emails(settings.MAIL_DISPATCH_BATCH_SIZE)
+    if not emails:
+        db.session.commit()
+        return 0
+    for delivery in _group_emails(emails):
+        try:
+            first = delivery[0]
+            if len(delivery) == 1:
+                send_email(first.to_email, first.ticket_id, first.status, first.details)
+            else:
+                send_batch([(email.to_email, email.ticket_id) for email in delivery], first.status, first.details)
+            now = datetime.utcnow()
+            for email in delivery:
+                email.attempts += 1
+                email.state = "sent"
+                email.sent_at = now
+                email.last_error = None
+        except Exception as e:
+            _mark_failed(delivery, str(e))
+    db.session.commit()
+    return len(emails)
+
+def run_mail_dispatcher(app):
+    """Background loop delivering the outbox until the process exits."""
+    logger.info("Mail dispatcher started")
+    while True:
+        handled = 0
+        with app.app_context():
+            try:
+                handled = dispatch_once()
+            except Exception as e:
+                logger.error(f"Mail dispatcher error: {str(e)}\n{traceback.format_exc()}")
+                db.session.rollback()
+        if handled < settings.MAIL_DISPATCH_BATCH_SIZE:
+            outbox_ready.wait(timeout=settings.MAIL_DISPATCH_POLL_SECONDS)
+            outbox_ready.clear()
@@ -0,0 +1,52 @@
+"""
+Registry of pre-compiled email templates, one per ticket status.
+
+Each template in templates/mail defines `subject`, `text` and `html` blocks. They are
+compiled once at import with HTML autoescaping (the text block opts out), and all
+three blocks are rendered from a single context.
+"""
+import os
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+from utils import metrics
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "mail")
+TEMPLATE_STATUSES = (
+    "l2_processed",
+    "l3_processing",
+    "l4_escalated",
+    "more_info_needed",
+    "feedback_needed",
+    "default"
+)
+
+environment = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=True,
+    undefined=StrictUndefined
+)
+templates = {status: environment.get_template(f"{status}.j2") for status in TEMPLATE_STATUSES}
+
+render_seconds = metrics.histogram(
+    "mail_render_seconds",
+    "Time spent rendering a notification email",
+    labels=("status",),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+
+def render_email(ticket_id: str, status: str, details: dict = None):
+    """
+    Render the subject, text and HTML bodies for a ticket status notification.
+
+    Returns:
+        tuple: (subject, text_body, html_body)
+    """
+    template_name = status if status in templates else "default"
+    template = templates[template_name]
+    with render_seconds.time(status=template_name):
+        context = template.new_context({"ticket_id": ticket_id, "status": status, "details": details or {}})
+        subject = "".join(template.blocks["subject"](context))
+        text_body = "".join(template.blocks["text"](context))
+        html_body = "".join(template.blocks["html"](context))
+    return subject, text_body, html_body
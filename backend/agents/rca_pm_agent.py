@@ -0,0 +1,89 @@
+"""
+Background enrichment stage that generates Root Cause Analysis and Preventive Measures.
+
+RCA/PM is not needed for the user-facing L2 response, so it runs on its own bounded
+pool (RCA_PM_MAX_WORKERS) with a single shared LLM client and writes Ticket.rca/pm
+when done; core.ticket_events pushes the change to the ticket's subscribers.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, has_app_context
+from langchain_openai import AzureChatOpenAI
+from pydantic import BaseModel, Field
+from core.config import settings
+from core.database import db
+from core.incident_clusters import cluster_rca_pm, record_cluster_rca_pm
+from core.ticket_writer import apply_ticket_updates
+from utils.logger import logger
+import traceback
+
+class RCAAndPM(BaseModel):
+    """Structured output for Root Cause Analysis and Preventive Measures"""
+    rca: str = Field(description="Root Cause Analysis identifying the underlying cause(s) of the issue")
+    pm: str = Field(description="Preventive Measures to prevent recurrence of the issue")
+
+model = AzureChatOpenAI(
+    azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+    api_key=settings.AZURE_OPENAI_API_KEY,
+    api_version=settings.AZURE_OPENAI_API_VERSION,
+    deployment_name=settings.AZURE_OPENAI_DEPLOYMENT
+)
+structured_llm = model.with_structured_output(RCAAndPM)
+
+executor = ThreadPoolExecutor(max_workers=settings.RCA_PM_MAX_WORKERS, thread_name_prefix="rca_pm")
+_app = None
+
+def init_rca_pm(app):
+    """Give the enrichment pool the app (for DB access)."""
+    global _app
+    _app = app
+
+def generate_rca_pm(description: str) -> RCAAndPM:
+    prompt = f"""
+    Given the following ticket description, provide a Root Cause Analysis (RCA) and Preventive Measures (PM):
+    
+    Ticket Description: {description}
+    
+    Provide:
+    1. Root Cause Analysis: Identify the underlying cause(s) of the issue (just one paragraph and dont include any special characters).
+    2. Preventive Measures: Suggest steps to prevent recurrence of the issue (just one paragraph and dont include any special characters).
+    """
+    return structured_llm.invoke(prompt)
+
+def _enrich_ticket(app, ticket_id: str, description: str, cluster_id: int = None):
+    try:
+        response = generate_rca_pm(description)
+        updates = {"rca": response.rca, "pm": response.pm}
+        with app.app_context():
+            if apply_ticket_updates(ticket_id, updates) is None:
+                logger.warning(f"Ticket {ticket_id} not found for RCA/PM update")
+                return
+            if cluster_id is not None:
+                followers = record_cluster_rca_pm(cluster_id, response.rca, response.pm)
+                for follower in followers:
+                    apply_ticket_updates(follower, updates)
+                if followers:
+                    logger.info(f"Copied RCA and PM to {len(followers)} followers in cluster {cluster_id}")
+            db.session.commit()
+        logger.info(f"Generated RCA and PM for ticket {ticket_id}")
+    except Exception as e:
+        logger.error(f"Error generating RCA/PM for ticket {ticket_id}: {str(e)}\n{traceback.format_exc()}")
+
+def submit_rca_pm(ticket_id: str, description: str, cluster_id: int = None):
+    """Queue RCA/PM generation for a ticket without waiting for it; a cluster leader shares it with its followers."""
+    app = _app or (current_app._get_current_object() if has_app_context() else None)
+    if app is None:
+        raise RuntimeError("RCA/PM enrichment needs init_rca_pm(app) or an app context")
+    return executor.submit(_enrich_ticket, app, ticket_id, description, cluster_id)
+
+def inherit_rca_pm(ticket_id: str, cluster_id: int):
+    """Copy the cluster's RCA/PM to a follower if the leader already has it; otherwise the leader copies it later."""
+    recorded = cluster_rca_pm(cluster_id)
+    if recorded is None:
+        return
+    rca, pm = recorded
+    try:
+        apply_ticket_updates(ticket_id, {"rca": rca, "pm": pm})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
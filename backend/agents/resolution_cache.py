@@ -0,0 +1,147 @@
+"""
+In-process cache of L2 predictions keyed by normalized ticket text.
+
+An exact hit needs the same text after Unicode/whitespace normalization and case
+folding. With near-duplicate lookup enabled, a 64-bit SimHash of the text's word
+unigrams and bigrams is also indexed: the hash is split into max_distance + 1 bands,
+so any cached text within max_distance differing bits shares at least one band with
+the query and is found without scanning the cache.
+
+Entries expire after a TTL and are namespaced by the L2 artifact key, so predictions
+made with older model artifacts are never served.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from agents.embedding_cache import normalize_text
+from utils import metrics
+
+SIMHASH_BITS = 64
+
+lookups = metrics.counter(
+    "resolution_cache_lookups_total",
+    "L2 prediction cache lookups by result (exact, near, miss)",
+    labels=("result",)
+)
+
+def cache_text(text: str) -> str:
+    return normalize_text(text).casefold()
+
+def simhash(text: str) -> int:
+    words = text.split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    weights = [0] * SIMHASH_BITS
+    for feature in features:
+        value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+class ResolutionCache:
+    def __init__(self, namespace: str, max_entries: int, ttl_seconds: float,
+                 near_duplicates: bool = False, similarity_threshold: float = 0.9):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.near_duplicates = near_duplicates
+        self.max_distance = int(SIMHASH_BITS * (1 - similarity_threshold))
+        self._entries = OrderedDict()   # text -> (expires_at, fingerprint, result), least recently used first
+        self._bands = {}                # (band, bits) -> set of texts
+        self._lock = threading.Lock()
+
+    def _band_keys(self, fingerprint: int) -> list:
+        count = min(self.max_distance + 1, SIMHASH_BITS)
+        width = SIMHASH_BITS // count
+        keys = []
+        for band in range(count):
+            # The last band takes the bits left over by the integer division
+            bits = SIMHASH_BITS - band * width if band == count - 1 else width
+            keys.append((band, fingerprint >> band * width & (1 << bits) - 1))
+        return keys
+
+    def _remove(self, text: str):
+        _, fingerprint, _ = self._entries.pop(text)
+        if fingerprint is None:
+            return
+        for key in self._band_keys(fingerprint):
+            members = self._bands.get(key)
+            if members is not None:
+                members.discard(text)
+                if not members:
+                    del self._bands[key]
+
+    def _live(self, text: str, now: float):
+        entry = self._entries.get(text)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            self._remove(text)
+            return None
+        self._entries.move_to_end(text)
+        return entry
+
+    def get(self, reported_issue: str):
+        """The cached prediction for this text or a near duplicate of it, else None."""
+        text = cache_text(reported_issue)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(text, now)
+            if entry is not None:
+                lookups.inc(result="exact")
+                return dict(entry[2])
+            if self.near_duplicates:
+                fingerprint = simhash(text)
+                candidates = set()
+                for key in self._band_keys(fingerprint):
+                    candidates.update(self._bands.get(key, ()))
+                best = None
+                for candidate in candidates:
+                    entry = self._live(candidate, now)
+                    if entry is None:
+                        continue
+                    distance = bin(entry[1] ^ fingerprint).count("1")
+                    if distance <= self.max_distance and (best is None or distance < best[0]):
+                        best = (distance, entry[2])
+                if best is not None:
+                    lookups.inc(result="near")
+                    return dict(best[1])
+        lookups.inc(result="miss")
+        return None
+
+    def set(self, reported_issue: str, result: dict):
+        text = cache_text(reported_issue)
+        fingerprint = simhash(text) if self.near_duplicates else None
+        with self._lock:
+            if text in self._entries:
+                self._remove(text)
+            self._entries[text] = (time.monotonic() + self.ttl_seconds, fingerprint, dict(result))
+            if fingerprint is not None:
+                for key in self._band_keys(fingerprint):
+                    self._bands.setdefault(key, set()).add(text)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, namespace: str = None):
+        """Drop every entry; with a namespace (new artifact key), only if it differs from the current one."""
+        with self._lock:
+            if namespace is not None and namespace == self.namespace:
+                return
+            if namespace is not None:
+                self.namespace = namespace
+            self._entries.clear()
+            self._bands.clear()
+
+    def stats(self) -> dict:
+        values = lookups.values()
+        hits = sum(count for (result,), count in values.items() if result != "miss")
+        total = sum(values.values())
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "namespace": self.namespace,
+            "entries": size,
+            "lookups": {result: count for (result,), count in values.items()},
+            "hit_rate": hits / total if total else 0.0
+        }
@@ -0,0 +1,243 @@
+"""
+FAISS vector store that grows as tickets are resolved.
+
+The base index is built once from the training data. Resolved tickets are queued in
+the `faiss_pending_documents` table, so they survive restarts and any worker can
+ingest them. A flush claims a batch of rows (FOR UPDATE SKIP LOCKED), embeds it,
+saves it as its own delta directory (written to a temp name and renamed into place,
+so it appears atomically; the name is derived from the row ids, so a retried batch
+reuses it) and deletes the rows. Deltas are merged into the live index in place;
+searches hold the store lock only around the FAISS lookup, not the query embedding.
+Deltas written by other workers are picked up by `sync`.
+
+Once compact_after deltas sit on top of the base, one worker (chosen with a Postgres
+advisory lock) saves the merged index as a compacted base with a manifest of the
+deltas it contains. Processes start from the newest compacted base, and deltas it
+contains are deleted once they are older than the retention period.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import traceback
+
+from langchain.docstore.document import Document
+from langchain_community.vectorstores import FAISS
+
+from core.database import db
+from core.models import FaissPendingDocument
+from utils.logger import logger
+
+MANIFEST_FILE = "deltas.json"
+# Arbitrary key for pg_try_advisory_xact_lock, held by the worker that compacts
+COMPACTION_LOCK_KEY = 7305112
+KEEP_COMPACTED_BASES = 2
+
+class ResolvedTicketIndex:
+    def __init__(self, base_directory: str, delta_directory: str, embeddings, batch_size: int = 16,
+                 compact_after: int = 50, delta_retention_seconds: float = 3600):
+        self.base_directory = base_directory
+        self.delta_directory = delta_directory
+        self.compacted_directory = f"{base_directory.rstrip(os.sep)}_compacted"
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.compact_after = compact_after
+        self.delta_retention_seconds = delta_retention_seconds
+        self.store = None
+        self._store_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._loaded_deltas = set()
+        self._base_deltas = set()   # Deltas already contained in the base this process loaded
+
+    def _latest_compacted(self):
+        if not os.path.isdir(self.compacted_directory):
+            return None
+        names = sorted(name for name in os.listdir(self.compacted_directory) if not name.startswith("."))
+        return os.path.join(self.compacted_directory, names[-1]) if names else None
+
+    def _load_compacted(self, path: str):
+        store = FAISS.load_local(path, self.embeddings, allow_dangerous_deserialization=True)
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            deltas = set(json.load(f))
+        with self._store_lock:
+            self.store = store
+        self._loaded_deltas = set(deltas)
+        self._base_deltas = set(deltas)
+        logger.info(f"Loaded compacted FAISS vector store {path} ({len(deltas)} deltas)")
+
+    def load(self, build_documents):
+        """Load the newest compacted base (or the base, built from build_documents() if missing), then apply all deltas."""
+        compacted = self._latest_compacted()
+        if compacted:
+            self._load_compacted(compacted)
+        elif os.path.exists(self.base_directory):
+            logger.info(f"Loading existing FAISS vector store from {self.base_directory}")
+            self.store = FAISS.load_local(self.base_directory, self.embeddings, allow_dangerous_deserialization=True)
+            logger.info("Loaded FAISS vector store successfully")
+        else:
+            logger.info(f"Creating new FAISS vector store at {self.base_directory}")
+            self.store = FAISS.from_documents(build_documents(), self.embeddings)
+            self.store.save_local(self.base_directory)
+            logger.info("Created and saved FAISS vector store successfully")
+        os.makedirs(self.delta_directory, exist_ok=True)
+        self.sync()
+
+    def search(self, query: str, k: int = 5):
+        """(Document, score) pairs most similar to query."""
+        vector = self.embeddings.embed_query(query)
+        with self._store_lock:
+            return self.store.similarity_search_with_score_by_vector(vector, k=k)
+
+    def add_resolved_ticket(self, description: str, priority: str, classified_team: str, resolution: str):
+        """Queue a resolved ticket for ingestion and commit."""
+        if not description or not resolution:
+            return
+        db.session.add(FaissPendingDocument(
+            description=description,
+            priority=priority,
+            classified_team=classified_team,
+            resolution=resolution
+        ))
+        db.session.commit()
+        if FaissPendingDocument.query.count() >= self.batch_size:
+            self._flush_requested.set()
+
+    def flush(self):
+        """Embed one batch of queued tickets, persist it as a delta and merge it into the live index."""
+        with self._write_lock:
+            try:
+                rows = (
+                    FaissPendingDocument.query
+                    .order_by(FaissPendingDocument.id)
+                    .with_for_update(skip_locked=True)
+                    .limit(self.batch_size)
+                    .all()
+                )
+                if not rows:
+                    db.session.commit()
+                    return 0
+                name = f"{rows[0].id:012d}-{rows[-1].id:012d}"
+                path = os.path.join(self.delta_directory, name)
+                if os.path.exists(path):
+                    # Written by an attempt that failed before deleting the rows
+                    delta = FAISS.load_local(path, self.embeddings, allow_dangerous_deserialization=True)
+                else:
+                    delta = FAISS.from_documents([
+                        Document(
+                            page_content=row.description,
+                            metadata={
+                                "Priority": row.priority,
+                                "Classified Team": row.classified_team,
+                                "Resolution": row.resolution
+                            }
+                        ) for row in rows
+                    ], self.embeddings)
+                    tmp_path = os.path.join(self.delta_directory, f".tmp-{name}")
+                    delta.save_local(tmp_path)
+                    os.rename(tmp_path, path)
+                FaissPendingDocument.query.filter(
+                    FaissPendingDocument.id.in_([row.id for row in rows])
+                ).delete(synchronize_session=False)
+                db.session.commit()
+            except Exception:
+                # The rows stay queued for the next attempt
+                db.session.rollback()
+                raise
+            if name not in self._loaded_deltas:
+                self._merge({name: delta})
+            logger.info(f"Ingested {len(rows)} resolved tickets into FAISS delta {name}")
+            return len(rows)
+
+    def sync(self):
+        """Merge deltas persisted by any worker that this process has not loaded yet."""
+        with self._write_lock:
+            compacted = self._latest_compacted()
+            if compacted:
+                with open(os.path.join(compacted, MANIFEST_FILE)) as f:
+                    contained = set(json.load(f))
+                missing = contained - self._loaded_deltas
+                if any(not os.path.exists(os.path.join(self.delta_directory, name)) for name in missing):
+                    # Deltas this process never loaded were compacted and deleted; start from that base
+                    self._load_compacted(compacted)
+            names = sorted(
+                name for name in os.listdir(self.delta_directory)
+                if not name.startswith(".") and name not in self._loaded_deltas
+            )
+            if not names:
+                return
+            deltas = {
+                name: FAISS.load_local(
+                    os.path.join(self.delta_directory, name), self.embeddings,
+                    allow_dangerous_deserialization=True
+                )
+                for name in names
+            }
+            self._merge(deltas)
+            logger.info(f"Loaded {len(deltas)} FAISS deltas from {self.delta_directory}")
+
+    def _merge(self, deltas: dict):
+        # In place, proportional to the delta size; searches wait only for the merge itself
+        with self._store_lock:
+            for delta in deltas.values():
+                self.store.merge_from(delta)
+        self._loaded_deltas.update(deltas)
+
+    def compact(self):
+        """Save the merged index as a new compacted base once enough deltas sit on top of it."""
+        with self._write_lock:
+            if len(self._loaded_deltas - self._base_deltas) < self.compact_after:
+                return False
+            try:
+                if not db.session.execute(
+                    db.text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": COMPACTION_LOCK_KEY}
+                ).scalar():
+                    return False
+                with self._store_lock:
+                    snapshot = self.store.serialize_to_bytes()
+                    deltas = sorted(self._loaded_deltas)
+                store = FAISS.deserialize_from_bytes(snapshot, self.embeddings, allow_dangerous_deserialization=True)
+                name = f"{time.time_ns():020d}"
+                os.makedirs(self.compacted_directory, exist_ok=True)
+                tmp_path = os.path.join(self.compacted_directory, f".tmp-{name}")
+                store.save_local(tmp_path)
+                with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+                    json.dump(deltas, f)
+                os.rename(tmp_path, os.path.join(self.compacted_directory, name))
+                self._base_deltas = set(deltas)
+            finally:
+                db.session.commit()
+            logger.info(f"Compacted {len(deltas)} FAISS deltas into {name}")
+            return True
+
+    def prune(self):
+        """Delete all but the newest compacted bases, and deltas the newest contains once past retention."""
+        compacted = self._latest_compacted()
+        if not compacted:
+            return
+        names = sorted(name for name in os.listdir(self.compacted_directory) if not name.startswith("."))
+        for old in names[:-KEEP_COMPACTED_BASES]:
+            shutil.rmtree(os.path.join(self.compacted_directory, old), ignore_errors=True)
+        with open(os.path.join(compacted, MANIFEST_FILE)) as f:
+            contained = json.load(f)
+        expire_before = time.time() - self.delta_retention_seconds
+        for name in contained:
+            path = os.path.join(self.delta_directory, name)
+            if os.path.exists(path) and os.path.getmtime(path) < expire_before:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def run_forever(self, app, interval_seconds: float):
+        """Background loop: flush when a batch fills up or the interval elapses, then sync, compact and prune."""
+        while True:
+            self._flush_requested.wait(timeout=interval_seconds)
+            self._flush_requested.clear()
+            with app.app_context():
+                try:
+                    while self.flush() >= self.batch_size:
+                        pass
+                    self.sync()
+                    self.compact()
+                    self.prune()
+                except Exception as e:
+                    logger.error(f"FAISS ingestion error: {str(e)}\n{traceback.format_exc()}")
@@ -0,0 +1,222 @@
+from flask import Blueprint, jsonify, request
+from core.database import db
+from core.models import IncidentCluster, Ticket
+from api.auth_api import token_required, admin_required
+from api.ticket_queries import export_response
+from core.checkpoint_retention import prune_checkpoints
+from core.pools import pool_stats
+from core.status_counts import rebuild_status_counts
+from core.ticket_writer import apply_ticket_updates
+from agents.l2_agent import hybrid_predict_batch, resolution_cache
+from utils.logger import logger
+from utils import metrics
+import traceback
+
+admin_api = Blueprint('admin_api', __name__)
+
+MAX_RECLASSIFY_BATCH_SIZE = 2000
+MAX_RECLASSIFY_DIFFS = 1000
+
+@admin_api.route("/api/admin/reclassify", methods=["POST"])
+@token_required
+@admin_required
+def reclassify_tickets():
+    """Bulk re-classify tickets with the hybrid L2 classifier.
+
+    Body: {"sys_ids": [...], "source": "servicenow", "apply": false, "batch_size": 500, "max_diffs": 100}
+    Without sys_ids every ticket (optionally filtered by source) is re-classified.
+    With apply=true changed priorities and teams are written back through the ticket writer.
+    Returns counts and the first max_diffs tickets whose classification changed.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        sys_ids = data.get("sys_ids")
+        source = data.get("source")
+        apply = bool(data.get("apply", False))
+        batch_size = min(int(data.get("batch_size", 500)), MAX_RECLASSIFY_BATCH_SIZE)
+        max_diffs = min(int(data.get("max_diffs", 100)), MAX_RECLASSIFY_DIFFS)
+        if batch_size < 1:
+            return jsonify({"error": "batch_size must be positive"}), 400
+        if max_diffs < 0:
+            return jsonify({"error": "max_diffs must not be negative"}), 400
+
+        query = Ticket.query.with_entities(
+            Ticket.id, Ticket.sys_id, Ticket.description, Ticket.priority, Ticket.classified_team
+        )
+        if sys_ids:
+            query = query.filter(Ticket.sys_id.in_(sys_ids))
+        if source:
+            query = query.filter(Ticket.source == source.lower())
+
+        count = changed = 0
+        diffs = []
+        last_id = 0
+        while True:
+            rows = query.filter(Ticket.id > last_id).order_by(Ticket.id).limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            predictions = hybrid_predict_batch([row.description or "" for row in rows])
+            count += len(rows)
+            for row, pred in zip(rows, predictions):
+                if (row.priority, row.classified_team) == (pred["Priority"], pred["Classified Team"]):
+                    continue
+                changed += 1
+                if apply:
+                    apply_ticket_updates(row.sys_id, {
+                        "priority": pred["Priority"],
+                        "classified_team": pred["Classified Team"]
+                    })
+                if len(diffs) < max_diffs:
+                    diffs.append({
+                        "ticket_id": row.sys_id,
+                        "priority": {"from": row.priority, "to": pred["Priority"]},
+                        "classified_team": {"from": row.classified_team, "to": pred["Classified Team"]},
+                        "priority_confidence": pred["Priority Confidence"],
+                        "team_confidence": pred["Team Confidence"]
+                    })
+            if apply:
+                db.session.commit()
+
+        logger.info(f"Re-classified {count} tickets, {changed} changed (apply={apply})")
+        return jsonify({
+            "status": "success",
+            "count": count,
+            "changed": changed,
+            "applied": apply,
+            "diffs": diffs,
+            "diffs_truncated": changed > len(diffs)
+        }), 200
+    except Exception as e:
+        logger.error(f"Error re-classifying tickets: {str(e)}\n{traceback.format_exc()}")
+        db.session.rollback()
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@admin_api.route("/api/admin/incidents/export", methods=["GET"])
+@token_required
+@admin_required
+def export_all_incidents():
+    """Stream every ticket as NDJSON or CSV (filters: email, source, status, from, to, fields)"""
+    try:
+        query = Ticket.query
+        if request.args.get("email"):
+            query = query.filter(Ticket.email == request.args["email"])
+        try:
+            return export_response(query, request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error exporting incidents: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@admin_api.route("/api/admin/metrics/mail", methods=["GET"])
+@token_required
+@admin_required
+def get_mail_metrics():
+    """Per-status email render timings"""
+    return jsonify(metrics.snapshot("mail_")), 200
+
+@admin_api.route("/api/admin/metrics/db", methods=["GET"])
+@token_required
+@admin_required
+def get_db_pool_metrics():
+    """Connection pool utilization for this process, with the server's max_connections"""
+    try:
+        stats = pool_stats(db.engine)
+        stats["postgres_max_connections"] = int(db.session.execute(db.text("SHOW max_connections")).scalar())
+        return jsonify(stats), 200
+    except Exception as e:
+        logger.error(f"Error fetching pool metrics: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@admin_api.route("/api/admin/status-counts/rebuild", methods=["POST"])
+@token_required
+@admin_required
+def rebuild_ticket_status_counts():
+    """Recompute the materialized ticket status counters from the tickets table"""
+    try:
+        rows = rebuild_status_counts()
+        logger.info(f"Rebuilt {rows} ticket status counters")
+        return jsonify({"status": "success", "rows": rows}), 200
+    except Exception as e:
+        logger.error(f"Error rebuilding status counts: {str(e)}\n{traceback.format_exc()}")
+        db.session.rollback()
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@admin_api.route("/api/admin/checkpoints/prune", methods=["POST"])
+@token_required
+@admin_required
+def prune_graph_checkpoints():
+    """Run one checkpoint retention pass now. Body: {"batch_size": 200}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        batch_size = data.get("batch_size")
+        if batch_size is not None and int(batch_size) < 1:
+            return jsonify({"error": "batch_size must be positive"}), 400
+        summary = prune_checkpoints(int(batch_size) if batch_size else None)
+        logger.info(f"Checkpoint retention run: {summary}")
+        return jsonify({"status": "success", **summary}), 200
+    except Exception as e:
+        logger.error(f"Error pruning checkpoints: {str(e)}\n{traceback.format_exc()}")
+        db.session.rollback()
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@admin_api.route("/api/admin/metrics/checkpoints", methods=["GET"])
+@token_required
+@admin_required
+def get_checkpoint_metrics():
+    """Checkpoint retention counters and run timings"""
+    return jsonify(metrics.snapshot("checkpoint_")), 200
+
+@admin_api.route("/api/admin/metrics/chat", methods=["GET"])
+@token_required
+@admin_required
+def get_chat_metrics():
+    """Chatbot time-to-first-token and full reply timings"""
+    return jsonify(metrics.snapshot("chat_")), 200
+
+@admin_api.route("/api/admin/resolution-cache", methods=["GET"])
+@token_required
+@admin_required
+def get_resolution_cache_stats():
+    """L2 prediction cache size, lookups by result and hit rate"""
+    return jsonify(resolution_cache.stats()), 200
+
+@admin_api.route("/api/admin/resolution-cache/clear", methods=["POST"])
+@token_required
+@admin_required
+def clear_resolution_cache():
+    """Drop every cached L2 prediction in this process"""
+    resolution_cache.invalidate()
+    logger.info("Cleared the L2 resolution cache")
+    return jsonify({"status": "success"}), 200
+
+@admin_api.route("/api/admin/incident-clusters", methods=["GET"])
+@token_required
+@admin_required
+def get_incident_clusters():
+    """Most recently active incident clusters with more than one ticket. Query: ?limit=50"""
+    try:
+        limit = min(int(request.args.get("limit", 50)), 500)
+        clusters = (
+            IncidentCluster.query
+            .filter(IncidentCluster.member_count > 1)
+            .order_by(IncidentCluster.last_seen_at.desc())
+            .limit(limit)
+            .all()
+        )
+        return jsonify({
+            "clusters": [{
+                "id": cluster.id,
+                "leader_ticket_id": cluster.leader_ticket_id,
+                "member_count": cluster.member_count,
+                "has_prediction": cluster.prediction is not None,
+                "has_rca_pm": cluster.rca is not None,
+                "created_at": cluster.created_at.isoformat(),
+                "last_seen_at": cluster.last_seen_at.isoformat()
+            } for cluster in clusters],
+            "assignments": metrics.snapshot("cluster_")
+        }), 200
+    except Exception as e:
+        logger.error(f"Error fetching incident clusters: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"status": "error", "message": str(e)}), 500
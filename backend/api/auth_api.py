@@ -1,29 +1,102 @@
 from flask import Blueprint, request, jsonify
+import hashlib
 import jwt
+import time
 from datetime import datetime, timedelta
 from functools import wraps
 from uuid import uuid4
+from core import cache_invalidation
 from core.config import settings
 from core.database import db
-from core.models import User, RefreshToken
+from core.models import User, RefreshToken, RevokedAccessToken
 from utils.logger import logger
+from utils.ttl_cache import TTLCache
 
 auth_api = Blueprint("auth_api", __name__)
 
+# SHA-256 of the access token -> (claims, user_id); entries never outlive the token's exp.
+# Revocations are stored in revoked_access_tokens and evicted from every process's cache.
+token_cache = TTLCache(settings.TOKEN_CACHE_MAX_ENTRIES, settings.TOKEN_CACHE_TTL_SECONDS)
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def authenticate_token(token: str):
+    """
+    Verify an access token and resolve its user, using the token cache when possible.
+
+    Returns:
+        tuple: (claims, user_id); user_id is None when the user no longer exists
+    Raises:
+        jwt.InvalidTokenError: the token is invalid, expired or revoked
+    """
+    key = token_hash(token)
+    cached = token_cache.get(key)
+    if cached is not None:
+        return cached
+    claims = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+    if db.session.get(RevokedAccessToken, key) is not None:
+        raise jwt.InvalidTokenError("Token has been revoked")
+    user_id = db.session.query(User.id).filter_by(email=claims["email"]).scalar()
+    if user_id is not None:
+        token_cache.set(key, (claims, user_id), claims["exp"] - time.time() if "exp" in claims else None)
+    return claims, user_id
+
+def revoke_token(token: str):
+    """Reject an access token in every process until it expires, and commit."""
+    claims = jwt.decode(
+        token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM], options={"verify_exp": False}
+    )
+    expires_at = (
+        datetime.utcfromtimestamp(claims["exp"]) if "exp" in claims
+        else datetime.utcnow() + timedelta(minutes=settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    key = token_hash(token)
+    if db.session.get(RevokedAccessToken, key) is None:
+        db.session.add(RevokedAccessToken(token_hash=key, expires_at=expires_at))
+    RevokedAccessToken.query.filter(RevokedAccessToken.expires_at < datetime.utcnow()).delete(synchronize_session=False)
+    db.session.commit()
+    cache_invalidation.publish("token", key)
+
+def invalidate_user_tokens(user_id: int):
+    """Drop every cached access token of a user, in every process, so the next request re-verifies it."""
+    cache_invalidation.publish("user_tokens", user_id)
+
+cache_invalidation.register("token", token_cache.pop, token_cache.clear)
+cache_invalidation.register(
+    "user_tokens", lambda user_id: token_cache.discard_where(lambda entry: entry[1] == user_id), token_cache.clear
+)
+
+def bearer_token() -> str:
+    header = request.headers.get("Authorization", "")
+    parts = header.split(" ")
+    return parts[1] if len(parts) > 1 else None
+
 def token_required(f):
+    """Authenticate the bearer token and set request.email and request.user_id."""
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get("Authorization")
-        if not token:
+        if not request.headers.get("Authorization"):
             return jsonify({"error": "Token is missing"}), 401
         try:
-            token = token.split(" ")[1]  
-            data = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-            request.email = data["email"]
+            claims, user_id = authenticate_token(bearer_token())
         except jwt.ExpiredSignatureError:
             return jsonify({"error": "Token has expired"}), 401
         except jwt.InvalidTokenError:
             return jsonify({"error": "Invalid token"}), 401
+        if user_id is None:
+            return jsonify({"error": "User not found"}), 404
+        request.email = claims["email"]
+        request.user_id = user_id
+        return f(*args, **kwargs)
+    return decorated
+
+def admin_required(f):
+    """Restrict an endpoint to the users listed in ADMIN_EMAILS. Use after token_required."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if request.email not in settings.ADMIN_EMAILS:
+            return jsonify({"error": "Admin access required"}), 403
         return f(*args, **kwargs)
     return decorated
 
@@ -107,6 +180,7 @@ def refresh():
         user = User.query.get(token_record.user_id)
         if not user:
             return jsonify({"error": "User not found"}), 404
+        invalidate_user_tokens(user.id)
         
         # Generate new access token
         access_token = jwt.encode(
@@ -134,7 +208,8 @@ def logout():
         
         if token_record:
             token_record.is_revoked = True
-            db.session.commit()
+        # Commits the refresh token revocation together with the access token's
+        revoke_token(bearer_token())
         
         return jsonify({"message": "Logged out successfully"}), 200
     except Exception as e:
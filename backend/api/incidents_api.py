@@ -1,28 +1,44 @@
 import uuid
-from flask import Blueprint, jsonify, redirect, request
+from flask import Blueprint, jsonify, redirect, request, session
+from core.checkpoint_retention import record_chat_activity
 from core.database import db
-from core.models import User, Ticket
-from api.auth_api import token_required
-from graph import create_graph
-from chatbot_graph import create_chatbot_graph
+from core.models import User, Ticket, ProcessingJob
+from core.incident_clusters import assign_cluster, cluster_age_seconds, cluster_prediction
+from core.job_queue import JobDeferred, enqueue_job, register_job_handler
+from core.status_counts import get_status_counts, user_room
+from core.ticket_cache import get_ticket_details
+from core.ticket_events import ticket_room
+from core.ticket_writer import apply_ticket_updates, insert_ticket
+from api.auth_api import authenticate_token, token_required
+from api.ticket_queries import decode_cursor, export_response, paginate_tickets, parse_fields
+from graph import get_graph
+from agents.l2_agent import vector_index
+from chatbot_graph import get_chatbot_graph, seed_ticket_context
 from utils.logger import logger
+from utils import metrics
+import time
 import traceback
+import jwt
 import requests
 from core.config import settings
 from requests.auth import HTTPBasicAuth
-from flask_socketio import SocketIO
 from werkzeug.security import generate_password_hash
 from datetime import datetime
 
-from flask_socketio import join_room, emit
-from langchain_core.messages import HumanMessage, SystemMessage
+from flask_socketio import emit, join_room, rooms
+from langchain_core.messages import HumanMessage
 
-socketio = SocketIO(cors_allowed_origins="*")
 incident_api = Blueprint('incident_api', __name__)
-graph = create_graph()
+INTERRUPT_NODES = ("more_info", "feedback_agent")
 
-# Initialize chatbot graph
-cgraph = create_chatbot_graph()
+chat_first_token_seconds = metrics.histogram(
+    "chat_time_to_first_token_seconds",
+    "Time from a chat message arriving to the first streamed token"
+)
+chat_response_seconds = metrics.histogram(
+    "chat_response_seconds",
+    "Time from a chat message arriving to the complete reply"
+)
 
 def extract_value(field):
     """Extract the 'value' from a ServiceNow field if it's a dictionary, else return the field as-is."""
@@ -30,6 +46,65 @@ def extract_value(field):
         return field['value']
     return field
 
+def cluster_payload(ticket_id, description):
+    """Job payload fields placing a new ticket in its incident cluster (empty when clustering is off)."""
+    if not settings.CLUSTERING_ENABLED:
+        return {}
+    cluster_id, is_leader = assign_cluster(ticket_id, description)
+    return {"cluster_id": cluster_id, "cluster_leader": is_leader}
+
+def cluster_state(payload):
+    """
+    Initial TicketState fields for a clustered ticket. A follower waits (the job is
+    deferred) for its leader's L2 prediction, and runs L2 itself as a leader once
+    CLUSTER_LEADER_WAIT_SECONDS have passed without one.
+    """
+    cluster_id = payload.get("cluster_id")
+    if cluster_id is None:
+        return {}
+    if payload.get("cluster_leader"):
+        return {"cluster_id": cluster_id, "cluster_leader": True}
+    prediction = cluster_prediction(cluster_id)
+    if prediction is not None:
+        return {"cluster_id": cluster_id, "cluster_leader": False, "inherited_prediction": prediction}
+    if cluster_age_seconds(cluster_id) < settings.CLUSTER_LEADER_WAIT_SECONDS:
+        raise JobDeferred(settings.CLUSTER_FOLLOWER_RETRY_SECONDS, f"waiting for the leader of cluster {cluster_id}")
+    logger.warning(f"No L2 prediction from the leader of cluster {cluster_id}; ticket {payload['ticket_id']} runs L2 itself")
+    return {"cluster_id": cluster_id, "cluster_leader": True}
+
+@register_job_handler("process_ticket")
+def run_ticket_graph(payload, socketio):
+    """Queue handler: run the ticket graph; its ticket writes are pushed as ticket_update frames."""
+    ticket_id = payload["ticket_id"]
+    user_email = payload["user_email"]
+    thread = {"configurable": {"thread_id": f"{user_email}:{ticket_id}"}}
+    graph = get_graph()
+    
+    # A retried job resumes its checkpointed run instead of starting over
+    snapshot = graph.get_state(thread)
+    if not snapshot.values:
+        initial_state = {
+            "ticket_id": ticket_id,
+            "user_email": user_email,
+            "description": payload["description"],
+            "status": "new",
+            "l2_count": 0,
+            **cluster_state(payload)
+        }
+        final_state = graph.invoke(initial_state, thread)
+    elif snapshot.next and not set(snapshot.next) & set(INTERRUPT_NODES):
+        final_state = graph.invoke(None, thread)
+    else:
+        final_state = snapshot.values
+    
+    # The graph nodes have already written their changes to the ticket row
+    ticket = Ticket.query.filter_by(sys_id=ticket_id).first()
+    if not ticket:
+        raise ValueError(f"Ticket {ticket_id} not found")
+    
+    logger.info(f"Processed ticket {ticket_id} from queue, status: {ticket.status}")
+    return {"status": ticket.status, "priority": ticket.priority, "classified_team": ticket.classified_team}
+
 # One-time import endpoint (comment out after initial use)
 # @incident_api.route("/api/import_servicenow_tickets", methods=["POST"])
 # @token_required
@@ -122,45 +197,55 @@ def process_ticket():
         source = data.get("source")  # New source field
         user_email = request.email
         
-        user = User.query.filter_by(email=user_email).first()
-        if not user:
-            return jsonify({"status": "error", "message": "User not found"}), 404
-        
-        ticket = Ticket(
+        inserted = insert_ticket(
             sys_id=ticket_id,
-            user_id=user.id,
+            user_id=request.user_id,
             email=user_email,
             description=description,
             status="new",
             source=source  # Save source
         )
-        db.session.add(ticket)
-        db.session.commit()  # Commit to ensure ticket is saved before RCA/PM
+        if not inserted:
+            db.session.rollback()
+            return jsonify({"status": "error", "message": "Ticket already exists"}), 409
         
-        initial_state = {
+        # The ticket and its job are committed together; a worker runs the graph
+        job = enqueue_job("process_ticket", ticket_id, user_email, {
             "ticket_id": ticket_id,
             "user_email": user_email,
             "description": description,
-            "status": "new",
-            "l2_count": 0
-        }
-        
-        # Proceed with main graph processing
-        thread = {"configurable": {"thread_id": f"{user_email}:{ticket_id}"}}
-        final_state = graph.invoke(initial_state, thread)
-        ticket.status = final_state["status"]
-        if "resolution" in final_state and final_state.get("feedback_satisfied"):
-            ticket.l2_resolution = final_state["resolution"]
-            ticket.priority = final_state.get("priority")
-            ticket.classified_team = final_state.get("classified_team")
+            **cluster_payload(ticket_id, description)
+        }, commit=False)
         db.session.commit()
         
-        return jsonify({"status": "success", "message": "Ticket processed", "state": final_state}), 200
+        return jsonify({"status": "accepted", "message": "Ticket queued for processing", "job_id": job.id}), 202
     except Exception as e:
         logger.error(f"Error processing ticket: {str(e)}\n{traceback.format_exc()}")
         db.session.rollback()
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@incident_api.route("/api/jobs/<job_id>", methods=["GET"])
+@token_required
+def get_job(job_id):
+    """Return the state of a queued ticket processing job"""
+    try:
+        job = ProcessingJob.query.filter_by(id=job_id, user_email=request.email).first()
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify({
+            "job_id": job.id,
+            "ticket_id": job.ticket_id,
+            "status": job.status,
+            "attempts": job.attempts,
+            "result": job.result,
+            "error": job.error,
+            "created_at": job.created_at.isoformat(),
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None
+        }), 200
+    except Exception as e:
+        logger.error(f"Error fetching job {job_id}: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 @incident_api.route("/api/more_info", methods=["POST"])
 @token_required
 def submit_more_info():
@@ -170,26 +255,20 @@ def submit_more_info():
         additional_info = data.get("additional_info")
         user_email = request.email
         
-        user = User.query.filter_by(email=user_email).first()
-        if not user:
-            return jsonify({"error": "User not found"}), 404
-        ticket = Ticket.query.filter_by(sys_id=ticket_id, user_id=user.id).first()
-        if not ticket:
+        ticket = apply_ticket_updates(ticket_id, {
+            "description": Ticket.description + f"\nAdditional Info: {additional_info}",
+            "status": "more_info_received"
+        }, user_id=request.user_id)
+        if ticket is None:
             return jsonify({"error": "Ticket not found"}), 404
-        
-        ticket.description += f"\nAdditional Info: {additional_info}"
         db.session.commit()
         
+        # Each graph step writes its own changes to the ticket
         thread = {"configurable": {"thread_id": f"{user_email}:{ticket_id}"}}
+        graph = get_graph()
         graph.update_state(thread, values={"additional_info": additional_info, "status": "more_info_received"}, as_node="more_info")
         
         final_state = graph.invoke(None, thread)
-        ticket.status = final_state["status"]
-        if "resolution" in final_state and final_state.get("feedback_satisfied"):
-            ticket.l2_resolution = final_state["resolution"]
-            ticket.priority = final_state.get("priority")
-            ticket.classified_team = final_state.get("classified_team")
-        db.session.commit()
         
         return jsonify({"status": "success", "message": "Additional info submitted", "state": final_state}), 200
     except Exception as e:
@@ -206,28 +285,28 @@ def submit_feedback():
         feedback = data.get("feedback")
         user_email = request.email
         
-        user = User.query.filter_by(email=user_email).first()
-        if not user:
-            return jsonify({"error": "User not found"}), 404
-        ticket = Ticket.query.filter_by(sys_id=ticket_id, user_id=user.id).first()
-        if not ticket:
+        ticket = apply_ticket_updates(ticket_id, {
+            "feedback": feedback,
+            "status": "feedback_received"
+        }, user_id=request.user_id)
+        if ticket is None:
             return jsonify({"error": "Ticket not found"}), 404
-        
-        ticket.feedback = feedback
         db.session.commit()
         
         satisfied = feedback.lower() == "yes"
         
+        # Each graph step writes its own changes to the ticket
         thread = {"configurable": {"thread_id": f"{user_email}:{ticket_id}"}}
+        graph = get_graph()
         graph.update_state(thread, values={"feedback_satisfied": satisfied, "status": "feedback_received"}, as_node="feedback_agent")
         
         final_state = graph.invoke(None, thread)
-        ticket.status = final_state["status"]
-        if satisfied and "resolution" in final_state:
-            ticket.l2_resolution = final_state["resolution"]
-            ticket.priority = final_state.get("priority")
-            ticket.classified_team = final_state.get("classified_team")
-        db.session.commit()
+        
+        # Make the confirmed resolution retrievable for similar future tickets
+        if satisfied and final_state.get("resolution"):
+            vector_index.add_resolved_ticket(
+                ticket.description, final_state.get("priority"), final_state.get("classified_team"), final_state["resolution"]
+            )
         
         return jsonify({"status": "success", "message": "Feedback submitted", "state": final_state}), 200
     except Exception as e:
@@ -235,51 +314,66 @@ def submit_feedback():
         db.session.rollback()
         return jsonify({"status": "error", "message": str(e)}), 500
     
+def page_params():
+    """Read fields/limit/cursor query parameters, raising ValueError when invalid."""
+    fields = parse_fields(request.args.get("fields"))
+    limit = request.args.get("limit", type=int) or settings.INCIDENTS_PAGE_SIZE
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    cursor = request.args.get("cursor")
+    if cursor:
+        decode_cursor(cursor)
+    return fields, min(limit, settings.INCIDENTS_MAX_PAGE_SIZE), cursor
+
+def page_response(items, next_cursor):
+    """JSON list of tickets; the cursor for the next page goes in X-Next-Cursor."""
+    response = jsonify(items)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
+
 @incident_api.route("/api/incidents", methods=["GET"])
 @token_required
 def get_incidents():
-    """Fetch user-specific incidents from the tickets table"""
+    """Fetch one page of user-specific incidents from the tickets table"""
     try:
         user_email = request.email
-        user = User.query.filter_by(email=user_email).first()
-        if not user:
-            return jsonify({"error": "User not found"}), 404
         
-        # Fetch all tickets for this user
-        tickets = Ticket.query.filter_by(user_id=user.id).all()
-        incidents = [{
-            "ticket_id": ticket.sys_id,
-            "email": ticket.email,
-            "description": ticket.description,
-            "status": ticket.status,
-            "priority": ticket.priority,
-            "classified_team": ticket.classified_team,
-            "user_feedback": ticket.feedback,
-            "created_at": ticket.created_at.isoformat(),
-            "l2_resolution": ticket.l2_resolution,
-            "source": ticket.source,
-            "rca": ticket.rca,
-            "pm": ticket.pm
-        } for ticket in tickets]
+        try:
+            fields, limit, cursor = page_params()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        incidents, next_cursor = paginate_tickets(Ticket.query.filter_by(user_id=request.user_id), fields, limit, cursor)
         
         logger.info(f"Fetched incidents for {user_email}: {len(incidents)} tickets")
-        return jsonify(incidents), 200
+        return page_response(incidents, next_cursor)
     except Exception as e:
         logger.error(f"Error fetching incidents: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
     
+@incident_api.route("/api/incidents/export", methods=["GET"])
+@token_required
+def export_incidents():
+    """Stream the user's tickets as NDJSON or CSV (filters: source, status, from, to, fields)"""
+    try:
+        try:
+            return export_response(Ticket.query.filter_by(user_id=request.user_id), request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error exporting incidents: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 @incident_api.route("/api/incidents/<ticket_id>", methods=["GET"])
 @token_required
 def get_incident_by_id(ticket_id):
     """Fetch a specific ticket by ticket_id for the authenticated user"""
     try:
         user_email = request.email
-        user = User.query.filter_by(email=user_email).first()
-        if not user:
-            return jsonify({"error": "User not found"}), 404
         
         # Fetch the specific ticket for this user
-        ticket = Ticket.query.filter_by(sys_id=ticket_id, user_id=user.id).first()
+        ticket = Ticket.query.filter_by(sys_id=ticket_id, user_id=request.user_id).first()
         if not ticket:
             return jsonify({"error": "Ticket not found or does not belong to user"}), 404
         
@@ -310,42 +404,29 @@ def get_incident_by_id(ticket_id):
 @incident_api.route("/api/incidents/source", methods=["GET"])
 @token_required
 def get_incidents_by_source():
-    """Fetch user-specific incidents filtered by source (servicenow/jira/all)"""
+    """Fetch one page of user-specific incidents filtered by source (servicenow/jira/all)"""
     try:
         user_email = request.email
         source = request.args.get("source", "all").lower()
         
-        user = User.query.filter_by(email=user_email).first()
-        if not user:
-            return jsonify({"error": "User not found"}), 404
-        
         # Validate source parameter
         if source not in ["servicenow", "jira", "all"]:
             return jsonify({"error": "Invalid source parameter. Use 'servicenow', 'jira', or 'all'"}), 400
         
+        try:
+            fields, limit, cursor = page_params()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
         # Fetch tickets based on source
-        query = Ticket.query.filter_by(user_id=user.id)
+        query = Ticket.query.filter_by(user_id=request.user_id)
         if source != "all":
             query = query.filter_by(source=source)
         
-        tickets = query.all()
-        incidents = [{
-            "ticket_id": ticket.sys_id,
-            "email": ticket.email,
-            "description": ticket.description,
-            "status": ticket.status,
-            "priority": ticket.priority,
-            "classified_team": ticket.classified_team,
-            "user_feedback": ticket.feedback,
-            "created_at": ticket.created_at.isoformat(),
-            "l2_resolution": ticket.l2_resolution,
-            "source": ticket.source,
-            "rca": ticket.rca,
-            "pm": ticket.pm
-        } for ticket in tickets]
+        incidents, next_cursor = paginate_tickets(query, fields, limit, cursor)
         
         logger.info(f"Fetched {len(incidents)} incidents for {user_email} with source {source}")
-        return jsonify(incidents), 200
+        return page_response(incidents, next_cursor)
     except Exception as e:
         logger.error(f"Error fetching incidents by source for {user_email}: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -368,12 +449,6 @@ def servicenow_webhook():
         created_on = extract_value(ticket_data.get('sys_created_on'))
         updated_on = extract_value(ticket_data.get('sys_updated_on'))
 
-        # Check if ticket already exists
-        existing_ticket = Ticket.query.filter_by(sys_id=sys_id).first()
-        if existing_ticket:
-            logger.info(f"Ticket {sys_id} already exists, skipping")
-            return jsonify({"status": "success", "message": "Ticket already processed"}), 200
-
         # Find or create user
         user = User.query.filter_by(email=email).first()
         if not user:
@@ -389,8 +464,8 @@ def servicenow_webhook():
         created_at = datetime.strptime(created_on, '%Y-%m-%d %H:%M:%S') if created_on else datetime.utcnow()
         updated_at = datetime.strptime(updated_on, '%Y-%m-%d %H:%M:%S') if updated_on else created_at
 
-        # Create ticket
-        ticket = Ticket(
+        # Create ticket; the sys_id unique index turns a redelivered webhook into a no-op
+        inserted = insert_ticket(
             sys_id=sys_id,
             user_id=user.id,
             email=email,
@@ -399,46 +474,22 @@ def servicenow_webhook():
             updated_at=updated_at,
             source="servicenow"  # Set source for ServiceNow webhook
         )
-        db.session.add(ticket)
-        db.session.commit()  # Commit to ensure ticket is saved before RCA/PM
+        if not inserted:
+            db.session.rollback()
+            logger.info(f"Ticket {sys_id} already exists, skipping")
+            return jsonify({"status": "success", "message": "Ticket already processed"}), 200
 
-        # Generate RCA and PM (updates database only)
-        initial_state = {
+        # Hand the graph run to the queue so ServiceNow gets an immediate answer
+        job = enqueue_job("process_ticket", sys_id, email, {
             "ticket_id": sys_id,
             "user_email": email,
             "description": description,
-            "status": "new",
-            "l2_count": 0
-        }
-
-        # Proceed with main graph processing
-        thread = {"configurable": {"thread_id": f"{email}:{sys_id}"}}
-        final_state = graph.invoke(initial_state, thread)
-        ticket.status = final_state["status"]
-        if "resolution" in final_state and final_state.get("feedback_satisfied"):
-            ticket.l2_resolution = final_state["resolution"]
-        ticket.priority = final_state.get("priority")
-        ticket.classified_team = final_state.get("classified_team")
+            **cluster_payload(sys_id, description)
+        }, commit=False)
         db.session.commit()
 
-        # Emit ticket update to frontend
-        socketio.emit("ticket_update", {
-            "ticket_id": ticket.sys_id,
-            "email": ticket.email,
-            "description": ticket.description,
-            "status": ticket.status,
-            "priority": ticket.priority,
-            "classified_team": ticket.classified_team,
-            "user_feedback": ticket.feedback,
-            "created_at": ticket.created_at.isoformat(),
-            "l2_resolution": ticket.l2_resolution,
-            "source": ticket.source,
-            "rca": ticket.rca,
-            "pm": ticket.pm
-        })
-
-        logger.info(f"Processed new ticket {sys_id} from ServiceNow webhook")
-        return jsonify({"status": "success", "message": "Ticket processed"}), 200
+        logger.info(f"Queued new ticket {sys_id} from ServiceNow webhook as job {job.id}")
+        return jsonify({"status": "accepted", "message": "Ticket queued for processing", "job_id": job.id}), 202
 
     except Exception as e:
         logger.error(f"Error in webhook: {str(e)}\n{traceback.format_exc()}")
@@ -449,78 +500,89 @@ def servicenow_webhook():
 @incident_api.route('/api/ticket-state-count', methods=['GET'])
 @token_required
 def get_ticket_state_count():
-    """Return the count of tickets by status for the authenticated user."""
+    """Return the count of tickets by status for the authenticated user (optionally per source)."""
     state = request.args.get('state', 'all').lower()
+    source = request.args.get('source', 'all').lower()
     user_email = request.email
 
     try:
-        user = User.query.filter_by(email=user_email).first()
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-
-        query = Ticket.query.filter_by(user_id=user.id)
-        
+        # Read from the materialized counters instead of grouping the tickets table
+        result = get_status_counts(request.user_id, None if source == 'all' else source)
         if state != 'all':
-            count = query.filter_by(status=state).count()
-            return jsonify({state: count})
-        else:
-            status_counts = (
-                query
-                .group_by(Ticket.status)
-                .with_entities(Ticket.status, db.func.count(Ticket.status))
-                .all()
-            )
-            result = {status.lower(): count for status, count in status_counts if status}
-            return jsonify(result)
+            return jsonify({state: result.get(state, 0)})
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Error fetching ticket state count for {user_email}: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 def init_socketio(socketio):
+    @socketio.on('connect')
+    def handle_connect(auth=None):
+        """Join the user's room (for ticket_state_count and ticket_update pushes) when a valid token is sent."""
+        token = (auth or {}).get('token')
+        if not token:
+            return
+        try:
+            _, user_id = authenticate_token(token)
+        except jwt.InvalidTokenError:
+            logger.warning("Socket.IO connection with an invalid token")
+            return
+        if user_id is not None:
+            session['user_id'] = user_id
+            join_room(user_room(user_id))
+
     @socketio.on('join')
     def handle_join(data):
         """Handle user joining a ticket chat."""
         ticket_id = data['ticket_id']
-        join_room(ticket_id)
-        ticket = Ticket.query.filter_by(sys_id=ticket_id).first()
-        if not ticket:
-            emit('error', {'message': 'Ticket not found'}, room=ticket_id)
+        ticket = get_ticket_details(ticket_id)
+        # Only the owner's authenticated connections may join the ticket's room
+        if not ticket or ticket['user_id'] != session.get('user_id'):
+            emit('error', {'message': 'Ticket not found'})
             return
+        join_room(ticket_room(ticket_id))
         
-        # Send ticket details as initial message
-        initial_message = {
-            'type': 'ticket_details',
-            'ticket': {
-                'id': ticket.sys_id,
-                'description': ticket.description,
-                'status': ticket.status,
-                'priority': ticket.priority,
-                'team': ticket.classified_team,
-                'resolution': ticket.l2_resolution,
-                'created_at': ticket.created_at.isoformat() if ticket.created_at else None,
-                'classified_team': ticket.classified_team,
-                'source': ticket.source,
-                'rca': ticket.rca,
-                'pm': ticket.pm
-            }
-        }
-        emit('message', initial_message, room=ticket_id)
+        # Send ticket details as initial message, to the joining client only
+        emit('message', {'type': 'ticket_details', 'ticket': ticket})
         
-        # Initialize conversation with system message including ticket context
-        system_content = (
-            f"You are an assistant helping with Ticket ID: {ticket.sys_id}. "
-            f"Description: {ticket.description}. Status: {ticket.status}. "
-            f"Priority: {ticket.priority}. Team: {ticket.classified_team}. "
-            f"Source: {ticket.source}. RCA: {ticket.rca}. PM: {ticket.pm}."
-        )
-        config = {"configurable": {"thread_id": ticket_id}}
-        cgraph.invoke({"messages": [SystemMessage(content=system_content)]}, config)
+        # Seed the conversation with the ticket context (no LLM call)
+        seed_ticket_context(ticket)
 
     @socketio.on('message')
     def handle_message(data):
-        """Handle user messages and generate AI responses."""
+        """Handle user messages and stream the AI response to the room."""
         ticket_id = data['ticket_id']
         user_message = data['message']
+        if ticket_room(ticket_id) not in rooms():
+            emit('error', {'message': 'Join the ticket before sending messages'})
+            return
         config = {"configurable": {"thread_id": ticket_id}}
-        result = cgraph.invoke({"messages": [HumanMessage(content=user_message)]}, config)
-        emit('message', {'type': 'text', 'text': result['messages'][-1].content}, room=ticket_id)
\ No newline at end of file
+        start = time.perf_counter()
+        first_token = True
+        reply = None
+        stream = get_chatbot_graph().stream(
+            {"messages": [HumanMessage(content=user_message)]}, config, stream_mode=["messages", "updates"]
+        )
+        for mode, payload in stream:
+            if mode == "updates":
+                # Taken from the chatbot update, the summarizer may trim it from the thread afterwards
+                if "chatbot" in payload:
+                    reply = payload["chatbot"]["messages"][-1]
+                continue
+            chunk, metadata = payload
+            if metadata.get("langgraph_node") != "chatbot" or not chunk.content:
+                continue
+            if first_token:
+                chat_first_token_seconds.observe(time.perf_counter() - start)
+                first_token = False
+            emit('message_chunk', {'type': 'text_chunk', 'text': chunk.content, 'message_id': chunk.id}, room=ticket_room(ticket_id))
+            # Let other rooms' greenlets run between chunks
+            socketio.sleep(0)
+        chat_response_seconds.observe(time.perf_counter() - start)
+        record_chat_activity(ticket_id)
+        if reply is None:
+            # The chatbot step produced no update (e.g. the run was cut short); chunks may have gone out
+            logger.error(f"Chat run for ticket {ticket_id} ended without a reply")
+            emit('error', {'message': 'No reply was generated, please try again'})
+            return
+        emit('message', {'type': 'text', 'text': reply.content, 'message_id': reply.id}, room=ticket_room(ticket_id))
@@ -0,0 +1,16 @@
+import hmac
+
+from flask import Blueprint, Response, request
+from core.config import settings
+from utils import metrics
+
+metrics_api = Blueprint('metrics_api', __name__)
+
+@metrics_api.route("/metrics", methods=["GET"])
+def get_metrics():
+    """This process's metrics in the Prometheus text format (scrape every worker)"""
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), expected):
+            return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
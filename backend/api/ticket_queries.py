@@ -0,0 +1,152 @@
+"""
+Column projection and keyset pagination for ticket listings.
+
+Pages are ordered by (created_at, id) descending and continued with an opaque cursor
+encoding the last row's (created_at, id), so every page is an index range scan on
+tickets(user_id, created_at, id) no matter how deep the client pages.
+
+Exports stream rows from a server-side cursor, so memory stays flat however many
+tickets match.
+"""
+import base64
+import csv
+import io
+import json
+from datetime import datetime
+
+from flask import Response, stream_with_context
+
+from core.database import db
+from core.models import Ticket
+
+# Public field name -> column
+TICKET_FIELDS = {
+    "ticket_id": Ticket.sys_id,
+    "email": Ticket.email,
+    "description": Ticket.description,
+    "status": Ticket.status,
+    "priority": Ticket.priority,
+    "classified_team": Ticket.classified_team,
+    "user_feedback": Ticket.feedback,
+    "created_at": Ticket.created_at,
+    "updated_at": Ticket.updated_at,
+    "l2_resolution": Ticket.l2_resolution,
+    "l2_is_new": Ticket.l2_is_new,
+    "l3_resolution": Ticket.l3_resolution,
+    "l4_status": Ticket.l4_status,
+    "source": Ticket.source,
+    "rca": Ticket.rca,
+    "pm": Ticket.pm
+}
+
+# Fields returned by the listing endpoints when `fields` is not given
+DEFAULT_LIST_FIELDS = [
+    "ticket_id", "email", "description", "status", "priority", "classified_team",
+    "user_feedback", "created_at", "l2_resolution", "source", "rca", "pm"
+]
+
+def parse_fields(raw: str) -> list:
+    """Parse a comma-separated `fields` parameter, raising ValueError on unknown names."""
+    if not raw:
+        return list(DEFAULT_LIST_FIELDS)
+    fields = list(dict.fromkeys(name.strip() for name in raw.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in TICKET_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def encode_cursor(created_at: datetime, ticket_pk: int) -> str:
+    raw = json.dumps([created_at.isoformat(), ticket_pk]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor: str) -> tuple:
+    """Return (created_at, id) from a cursor, raising ValueError if it is malformed."""
+    try:
+        created_at, ticket_pk = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(ticket_pk)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def serialize_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def project(query, fields: list):
+    """Select only the requested columns plus the pagination key."""
+    columns = [TICKET_FIELDS[name].label(name) for name in fields]
+    return query.with_entities(*columns, Ticket.created_at.label("_cursor_created_at"), Ticket.id.label("_cursor_id"))
+
+def paginate_tickets(query, fields: list, limit: int, cursor: str = None) -> tuple:
+    """Return (items, next_cursor) for one page of a ticket query."""
+    query = project(query, fields)
+    if cursor:
+        created_at, ticket_pk = decode_cursor(cursor)
+        query = query.filter(db.tuple_(Ticket.created_at, Ticket.id) < (created_at, ticket_pk))
+    rows = query.order_by(Ticket.created_at.desc(), Ticket.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]._cursor_created_at, rows[-1]._cursor_id)
+    items = [{name: serialize_value(getattr(row, name)) for name in fields} for row in rows]
+    return items, next_cursor
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv"
+}
+EXPORT_YIELD_PER = 1000
+
+def parse_date(raw: str, name: str) -> datetime:
+    try:
+        return datetime.fromisoformat(raw)
+    except ValueError:
+        raise ValueError(f"Invalid {name} date, expected ISO format")
+
+def apply_export_filters(query, args):
+    """Filter by source, status (comma-separated) and a created_at range [from, to)."""
+    source = args.get("source", "all").lower()
+    if source != "all":
+        query = query.filter(Ticket.source == source)
+    statuses = [status.strip() for status in args.get("status", "").split(",") if status.strip()]
+    if statuses:
+        query = query.filter(Ticket.status.in_(statuses))
+    if args.get("from"):
+        query = query.filter(Ticket.created_at >= parse_date(args["from"], "from"))
+    if args.get("to"):
+        query = query.filter(Ticket.created_at < parse_date(args["to"], "to"))
+    return query
+
+def stream_export(query, fields: list, export_format: str):
+    """Yield the export body chunk by chunk, fetching rows through a server-side cursor."""
+    rows = (
+        query.with_entities(*[TICKET_FIELDS[name].label(name) for name in fields])
+        .order_by(Ticket.created_at, Ticket.id)
+        .execution_options(yield_per=EXPORT_YIELD_PER)
+    )
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow([serialize_value(getattr(row, name)) for name in fields])
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        for row in rows:
+            yield json.dumps({name: serialize_value(getattr(row, name)) for name in fields}) + "\n"
+
+def export_response(query, args) -> Response:
+    """Streaming export of a ticket query; raises ValueError on invalid parameters."""
+    export_format = args.get("format", "ndjson").lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Invalid format. Use one of: {', '.join(EXPORT_FORMATS)}")
+    fields = parse_fields(args.get("fields"))
+    query = apply_export_filters(query, args)
+    return Response(
+        stream_with_context(stream_export(query, fields, export_format)),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f"attachment; filename=tickets.{export_format}"}
+    )
@@ -1,9 +1,16 @@
 from typing import TypedDict, Annotated
+import os
+import sqlite3
+import threading
 from langgraph.graph import StateGraph, END , add_messages
 from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.messages import AIMessage
+from langgraph.checkpoint.postgres import PostgresSaver
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately, trim_messages
 from langchain_openai import AzureChatOpenAI
+from core.checkpoint_retention import record_chat_activity
 from core.config import settings
+from core.pools import get_checkpoint_pool
 from utils.logger import logger
 import traceback
 
@@ -15,25 +22,131 @@ llm = AzureChatOpenAI(
     deployment_name=settings.AZURE_OPENAI_DEPLOYMENT
 )
 
-memory = MemorySaver()
+SUMMARY_PROMPT = (
+    "Summarize the conversation above between a user and a support assistant about this ticket. "
+    "Keep facts, steps already tried, decisions and open questions; drop pleasantries."
+)
+
+_chatbot_graph = None
+_chatbot_graph_lock = threading.Lock()
 
 class ChatState(TypedDict):
     messages: Annotated[list, add_messages]
+    summary: str                        # Running summary of turns dropped from messages
+
+def create_chat_checkpointer():
+    """Chat memory backend selected by CHAT_MEMORY_BACKEND."""
+    backend = settings.CHAT_MEMORY_BACKEND
+    if backend == "postgres":
+        checkpointer = PostgresSaver(get_checkpoint_pool())
+        checkpointer.setup()
+        return checkpointer
+    if backend == "sqlite":
+        try:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+        except ImportError:
+            raise RuntimeError("CHAT_MEMORY_BACKEND=sqlite requires the langgraph-checkpoint-sqlite package")
+        os.makedirs(os.path.dirname(os.path.abspath(settings.CHAT_MEMORY_SQLITE_PATH)), exist_ok=True)
+        connection = sqlite3.connect(settings.CHAT_MEMORY_SQLITE_PATH, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return SqliteSaver(connection)
+    if backend == "memory":
+        logger.warning("Chat memory is in-process; history is lost on restart")
+        return MemorySaver()
+    raise ValueError(f"Unknown CHAT_MEMORY_BACKEND '{backend}'. Use 'postgres', 'sqlite' or 'memory'")
+
+def build_prompt(state: ChatState) -> list:
+    """Latest ticket context, the running summary and as many recent turns as fit the token budget."""
+    messages = state["messages"]
+    system = [m for m in messages if isinstance(m, SystemMessage)][-1:]
+    if state.get("summary"):
+        system.append(SystemMessage(content=f"Summary of the earlier conversation: {state['summary']}"))
+    turns = trim_messages(
+        [m for m in messages if not isinstance(m, SystemMessage)],
+        max_tokens=settings.CHAT_MAX_PROMPT_TOKENS,
+        token_counter=count_tokens_approximately,
+        strategy="last",
+        start_on="human",
+        allow_partial=False
+    )
+    return system + turns
 
 def chatbot_node(state: ChatState):
-    """Process the chat state and generate an AI response."""
+    """Process the chat state and stream an AI response (tokens surface through graph.stream)."""
     try:
-        response = llm.invoke(state["messages"])
-        return {"messages": [response]}
+        response = None
+        for chunk in llm.stream(build_prompt(state)):
+            response = chunk if response is None else response + chunk
+        if response is None:
+            raise ValueError("Empty response from the model")
+        return {"messages": [AIMessage(content=response.content, id=response.id)]}
     except Exception as e:
         logger.error(f"Error in chatbot_node: {str(e)}\n{traceback.format_exc()}")
         return {"messages": [AIMessage(content="Sorry, I encountered an error. Please try again later.")]}
 
+def should_summarize(state: ChatState) -> str:
+    turns = [m for m in state["messages"] if not isinstance(m, SystemMessage)]
+    return "summarize" if len(turns) > settings.CHAT_SUMMARIZE_AFTER_MESSAGES else END
+
+def summarize_node(state: ChatState):
+    """Fold all but the most recent turns into the running summary and drop them from the thread."""
+    messages = state["messages"]
+    systems = [m for m in messages if isinstance(m, SystemMessage)]
+    turns = [m for m in messages if not isinstance(m, SystemMessage)]
+    old_turns = turns[:-settings.CHAT_KEEP_RECENT_MESSAGES] if settings.CHAT_KEEP_RECENT_MESSAGES else turns
+    # Superseded ticket context messages are dropped as well
+    removed = systems[:-1] + old_turns
+    try:
+        instruction = SUMMARY_PROMPT
+        if state.get("summary"):
+            instruction += f" Extend this existing summary: {state['summary']}"
+        summary = llm.invoke(old_turns + [HumanMessage(content=instruction)]).content
+    except Exception as e:
+        # Keep the turns; the next reply retries the summary
+        logger.error(f"Error summarizing chat: {str(e)}\n{traceback.format_exc()}")
+        return {"messages": [RemoveMessage(id=m.id) for m in systems[:-1]]}
+    return {"summary": summary, "messages": [RemoveMessage(id=m.id) for m in removed]}
+
+def seed_ticket_context(ticket: dict):
+    """
+    Write the ticket context into the ticket's chat thread without calling the LLM.
+
+    The context message id carries the ticket's updated_at, so it is only written when
+    the thread is new or the ticket changed since it was last seeded.
+    """
+    graph = get_chatbot_graph()
+    config = {"configurable": {"thread_id": ticket["id"]}}
+    context_id = f"ticket-context:{ticket['id']}:{ticket['updated_at']}"
+    messages = graph.get_state(config).values.get("messages", [])
+    seeded = [m for m in messages if isinstance(m, SystemMessage)][-1:]
+    if seeded and seeded[0].id == context_id:
+        return
+    content = (
+        f"You are an assistant helping with Ticket ID: {ticket['id']}. "
+        f"Description: {ticket['description']}. Status: {ticket['status']}. "
+        f"Priority: {ticket['priority']}. Team: {ticket['classified_team']}. "
+        f"Source: {ticket['source']}. RCA: {ticket['rca']}. PM: {ticket['pm']}."
+    )
+    # Recorded as the summarize step, whose only edge is END, so nothing is scheduled to run
+    graph.update_state(config, {"messages": [SystemMessage(content=content, id=context_id)]}, as_node="summarize")
+    record_chat_activity(ticket["id"])
+
 def create_chatbot_graph():
-    """Create and compile the chatbot graph with PostgresSaver."""
+    """Create and compile the chatbot graph with the configured chat memory backend."""
     graph = StateGraph(ChatState)
     graph.add_node("chatbot", chatbot_node)
-    graph.add_edge("chatbot", END)
+    graph.add_node("summarize", summarize_node)
     graph.set_entry_point("chatbot")
-    
-    return graph.compile(checkpointer=memory)
\ No newline at end of file
+    graph.add_conditional_edges("chatbot", should_summarize, {"summarize": "summarize", END: END})
+    graph.add_edge("summarize", END)
+
+    return graph.compile(checkpointer=create_chat_checkpointer())
+
+def get_chatbot_graph():
+    """The compiled chatbot graph for this process, built on first use."""
+    global _chatbot_graph
+    if _chatbot_graph is None:
+        with _chatbot_graph_lock:
+            if _chatbot_graph is None:
+                _chatbot_graph = create_chatbot_graph()
+    return _chatbot_graph
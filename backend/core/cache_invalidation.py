@@ -0,0 +1,103 @@
+"""
+Invalidation of per-process caches across server processes.
+
+The token and ticket caches (utils.ttl_cache) live in each process. With several
+processes (SOCKETIO_MESSAGE_QUEUE set), `publish` applies an invalidation locally
+and sends it with NOTIFY on CACHE_INVALIDATION_CHANNEL of the application database;
+every process LISTENs on that channel and applies the invalidations of the others.
+Publish after the write it reflects has committed, so other processes cannot reload
+the old row.
+
+A listener that loses its connection may have missed invalidations, so it resets
+every registered cache when it reconnects (and on the first connect).
+"""
+import json
+import select
+import threading
+import time
+import uuid
+
+import psycopg
+from psycopg import sql
+
+from core.config import settings
+from utils.logger import logger
+
+LISTEN_POLL_SECONDS = 5
+RECONNECT_DELAY_SECONDS = 1
+
+_origin = uuid.uuid4().hex
+_handlers = {}   # kind -> (invalidate(key), reset())
+_connection = None
+_connection_lock = threading.Lock()
+
+def register(kind: str, invalidate, reset):
+    """Route invalidations of `kind` to invalidate(key); reset() drops the whole cache."""
+    _handlers[kind] = (invalidate, reset)
+
+def enabled() -> bool:
+    return bool(settings.SOCKETIO_MESSAGE_QUEUE)
+
+def _publish_connection():
+    global _connection
+    if _connection is None or _connection.closed:
+        _connection = psycopg.connect(settings.DATABASE_URL, autocommit=True)
+    return _connection
+
+def publish(kind: str, key):
+    """Invalidate key in this process's cache of `kind` and, with several processes, in all others."""
+    _handlers[kind][0](key)
+    if not enabled():
+        return
+    global _connection
+    payload = json.dumps({"origin": _origin, "kind": kind, "key": key})
+    with _connection_lock:
+        for attempt in range(2):
+            try:
+                _publish_connection().execute(
+                    "SELECT pg_notify(%s, %s)", (settings.CACHE_INVALIDATION_CHANNEL, payload)
+                )
+                return
+            except psycopg.OperationalError as e:
+                _connection = None
+                if attempt:
+                    # Other processes catch up when the entry's TTL runs out
+                    logger.error(f"Could not publish {kind} cache invalidation: {str(e)}")
+
+def _apply(payload: str):
+    message = json.loads(payload)
+    if message.get("origin") == _origin:
+        return
+    handler = _handlers.get(message.get("kind"))
+    if handler is not None:
+        handler[0](message["key"])
+
+def _reset_all():
+    for _, reset in _handlers.values():
+        reset()
+
+def run_invalidation_listener():
+    """Background loop applying invalidations published by other processes."""
+    if not enabled():
+        return
+    logger.info("Cache invalidation listener started")
+    while True:
+        try:
+            with psycopg.connect(settings.DATABASE_URL, autocommit=True) as connection:
+                received = []
+                connection.add_notify_handler(lambda notify: received.append(notify.payload))
+                connection.execute(sql.SQL("LISTEN {}").format(sql.Identifier(settings.CACHE_INVALIDATION_CHANNEL)))
+                _reset_all()
+                while True:
+                    # Wait on the socket (green under eventlet), then let psycopg read the notifications
+                    readable, _, _ = select.select([connection.fileno()], [], [], LISTEN_POLL_SECONDS)
+                    if readable:
+                        connection.execute("SELECT 1")
+                    while received:
+                        try:
+                            _apply(received.pop(0))
+                        except Exception as e:
+                            logger.error(f"Invalid cache invalidation message: {str(e)}")
+        except psycopg.OperationalError as e:
+            logger.error(f"Cache invalidation listener connection lost: {str(e)}")
+            time.sleep(RECONNECT_DELAY_SECONDS)
@@ -0,0 +1,259 @@
+"""
+Retention for the ticket graph's PostgresSaver threads.
+
+Each ticket's graph run lives in thread "{email}:{sys_id}" with one checkpoint per
+node step. Once a ticket is finished and has been idle for CHECKPOINT_COMPACT_AFTER_SECONDS,
+its thread is compacted to the latest checkpoint. The checkpoint_writes and
+checkpoint_blobs rows nothing references any more are deleted with it. Threads of
+resolved or escalated tickets are dropped entirely after CHECKPOINT_RETENTION_DAYS.
+
+Each reason is a pass over the tickets changed since its watermark, in (updated_at, id)
+order, in batches of CHECKPOINT_PRUNE_BATCH_SIZE with one transaction per batch. The
+watermark (checkpoint_retention_watermarks) advances with every committed batch, so a
+run only reads tickets that changed since they were last handled; a ticket updated
+after compaction moves past the watermark again and is picked up by the next run. A
+transaction-level advisory lock keeps concurrent server processes from pruning at the
+same time.
+
+Chat memory threads (thread_id = the ticket's sys_id, see chatbot_graph) do not follow
+the ticket's status, so their activity is recorded in `chat_threads` whenever the chat
+writes to them. A thread idle for CHECKPOINT_COMPACT_AFTER_SECONDS is compacted once
+per burst of activity (compacted_at marks it handled), and one idle for
+CHECKPOINT_RETENTION_DAYS is dropped with its chat_threads row.
+"""
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects.postgresql import insert
+
+from core.config import settings
+from core.database import db
+from core.models import ChatThread, CheckpointRetentionWatermark
+from utils import metrics
+from utils.logger import logger
+
+# Tickets whose graph run has ended (no interrupt is waiting on user input)
+FINISHED_CONDITION = """(
+    t.status IN ('l2_processed', 'feedback_received', 'resolved', 'error')
+    OR t.status LIKE 'passed to L3%' OR t.status LIKE 'passed to L4%'
+)"""
+# Finished tickets whose thread is dropped after the retention window
+RESOLVED_OR_ESCALATED_CONDITION = """(
+    t.status IN ('feedback_received', 'resolved')
+    OR t.status LIKE 'passed to L3%' OR t.status LIKE 'passed to L4%'
+)"""
+
+ADVISORY_LOCK_KEY = 710_342_017
+
+# Watermark of a pass that has not run yet
+INITIAL_WATERMARK = datetime(1970, 1, 1)
+
+CANDIDATES_SQL = """
+SELECT t.id, t.updated_at, t.email || ':' || t.sys_id AS thread_id
+FROM tickets t
+WHERE (t.updated_at, t.id) > (:after_updated_at, :after_id) AND t.updated_at < :before AND {condition}
+ORDER BY t.updated_at, t.id
+LIMIT :limit
+"""
+
+DROP_SQL = {
+    "checkpoint_writes": "DELETE FROM checkpoint_writes WHERE thread_id = ANY(:threads)",
+    "checkpoint_blobs": "DELETE FROM checkpoint_blobs WHERE thread_id = ANY(:threads)",
+    "checkpoints": "DELETE FROM checkpoints WHERE thread_id = ANY(:threads)"
+}
+
+# Order matters: writes and blobs are matched against the checkpoints that survive
+COMPACT_SQL = {
+    "checkpoints": """
+        DELETE FROM checkpoints c
+        USING (
+            SELECT thread_id, checkpoint_ns, max(checkpoint_id) AS latest_id
+            FROM checkpoints WHERE thread_id = ANY(:threads)
+            GROUP BY thread_id, checkpoint_ns
+        ) latest
+        WHERE c.thread_id = latest.thread_id AND c.checkpoint_ns = latest.checkpoint_ns
+          AND c.checkpoint_id <> latest.latest_id
+    """,
+    "checkpoint_writes": """
+        DELETE FROM checkpoint_writes w
+        WHERE w.thread_id = ANY(:threads) AND NOT EXISTS (
+            SELECT 1 FROM checkpoints c
+            WHERE c.thread_id = w.thread_id AND c.checkpoint_ns = w.checkpoint_ns
+              AND c.checkpoint_id = w.checkpoint_id
+        )
+    """,
+    "checkpoint_blobs": """
+        DELETE FROM checkpoint_blobs b
+        WHERE b.thread_id = ANY(:threads) AND NOT EXISTS (
+            SELECT 1 FROM checkpoints c
+            WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+              AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+        )
+    """
+}
+
+# reason -> (candidate query, delete statements, upper bound parameter); drops run first
+PASSES = {
+    "dropped": (CANDIDATES_SQL.format(condition=RESOLVED_OR_ESCALATED_CONDITION), DROP_SQL, "expire_before"),
+    "compacted": (
+        CANDIDATES_SQL.format(
+            condition=f"{FINISHED_CONDITION} AND NOT (t.updated_at < :expire_before AND {RESOLVED_OR_ESCALATED_CONDITION})"
+        ),
+        COMPACT_SQL,
+        "settled_before"
+    )
+}
+
+CHAT_CANDIDATES_SQL = {
+    "chat_dropped": """
+        SELECT thread_id FROM chat_threads
+        WHERE last_message_at < :expire_before
+        ORDER BY last_message_at
+        LIMIT :limit
+    """,
+    "chat_compacted": """
+        SELECT thread_id FROM chat_threads
+        WHERE last_message_at < :settled_before AND last_message_at >= :expire_before
+          AND (compacted_at IS NULL OR compacted_at < last_message_at)
+        ORDER BY last_message_at
+        LIMIT :limit
+    """
+}
+
+# Conditional on the thread still being idle, so a message sent during the pass keeps it
+CHAT_HANDLED_SQL = {
+    "chat_dropped": """
+        DELETE FROM chat_threads
+        WHERE thread_id = ANY(:threads) AND last_message_at < :expire_before
+    """,
+    "chat_compacted": """
+        UPDATE chat_threads SET compacted_at = :now
+        WHERE thread_id = ANY(:threads)
+    """
+}
+
+reclaimed_rows = metrics.counter(
+    "checkpoint_reclaimed_rows_total",
+    "Checkpoint rows deleted by retention",
+    labels=("table", "reason")
+)
+pruned_threads = metrics.counter(
+    "checkpoint_pruned_threads_total",
+    "Ticket and chat threads examined for compaction or dropped by retention",
+    labels=("reason",)
+)
+prune_seconds = metrics.histogram("checkpoint_prune_seconds", "Duration of one checkpoint retention run")
+
+def _checkpoint_tables_exist() -> bool:
+    return db.session.execute(db.text("SELECT to_regclass('checkpoints') IS NOT NULL")).scalar()
+
+def _delete(statements: dict, threads: list, reason: str) -> dict:
+    reclaimed = {}
+    for table, sql in statements.items():
+        count = db.session.execute(db.text(sql), {"threads": threads}).rowcount
+        reclaimed_rows.inc(count, table=table, reason=reason)
+        reclaimed[table] = count
+    pruned_threads.inc(len(threads), reason=reason)
+    return reclaimed
+
+def record_chat_activity(thread_id: str):
+    """Mark a chat memory thread as written to now, and commit."""
+    if settings.CHAT_MEMORY_BACKEND != "postgres":
+        return
+    now = datetime.utcnow()
+    db.session.execute(
+        insert(ChatThread.__table__)
+        .values(thread_id=thread_id, last_message_at=now)
+        .on_conflict_do_update(index_elements=["thread_id"], set_={"last_message_at": now})
+    )
+    db.session.commit()
+
+def _advance_watermark(name: str, updated_at: datetime, ticket_id: int):
+    watermark = db.session.get(CheckpointRetentionWatermark, name)
+    if watermark is None:
+        db.session.add(CheckpointRetentionWatermark(name=name, updated_at=updated_at, ticket_id=ticket_id))
+    elif (updated_at, ticket_id) > (watermark.updated_at, watermark.ticket_id):
+        watermark.updated_at = updated_at
+        watermark.ticket_id = ticket_id
+
+def prune_checkpoints(batch_size: int = None) -> dict:
+    """
+    Run one retention pass over the tickets changed since the last one.
+
+    Returns:
+        dict: Threads and rows reclaimed per reason, or {"skipped": ...} when nothing ran
+    """
+    batch_size = batch_size or settings.CHECKPOINT_PRUNE_BATCH_SIZE
+    if not _checkpoint_tables_exist():
+        db.session.rollback()
+        return {"skipped": "checkpoint tables do not exist yet"}
+
+    now = datetime.utcnow()
+    bounds = {
+        "settled_before": now - timedelta(seconds=settings.CHECKPOINT_COMPACT_AFTER_SECONDS),
+        "expire_before": now - timedelta(days=settings.CHECKPOINT_RETENTION_DAYS)
+    }
+    summary = {
+        reason: {"threads": 0, "rows": {}}
+        for reason in ("compacted", "dropped", "chat_compacted", "chat_dropped")
+    }
+    with prune_seconds.time():
+        for reason, (candidates_sql, statements, upper_bound) in PASSES.items():
+            while True:
+                if not db.session.execute(db.text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ADVISORY_LOCK_KEY}).scalar():
+                    db.session.rollback()
+                    summary["skipped"] = "another process is pruning"
+                    return summary
+                watermark = db.session.get(CheckpointRetentionWatermark, reason)
+                rows = db.session.execute(db.text(candidates_sql), {
+                    "after_updated_at": watermark.updated_at if watermark else INITIAL_WATERMARK,
+                    "after_id": watermark.ticket_id if watermark else 0,
+                    "before": bounds[upper_bound],
+                    "expire_before": bounds["expire_before"],
+                    "limit": batch_size
+                }).all()
+                if not rows:
+                    # Everything before the bound is handled; later changes land above it
+                    _advance_watermark(reason, bounds[upper_bound], 0)
+                    db.session.commit()
+                    break
+                threads = [row.thread_id for row in rows]
+                summary[reason]["threads"] += len(threads)
+                for table, count in _delete(statements, threads, reason).items():
+                    summary[reason]["rows"][table] = summary[reason]["rows"].get(table, 0) + count
+                _advance_watermark(reason, rows[-1].updated_at, rows[-1].id)
+                db.session.commit()
+
+        for reason, candidates_sql in CHAT_CANDIDATES_SQL.items():
+            statements = DROP_SQL if reason == "chat_dropped" else COMPACT_SQL
+            while True:
+                if not db.session.execute(db.text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ADVISORY_LOCK_KEY}).scalar():
+                    db.session.rollback()
+                    summary["skipped"] = "another process is pruning"
+                    return summary
+                threads = db.session.execute(
+                    db.text(candidates_sql), {**bounds, "limit": batch_size}
+                ).scalars().all()
+                if not threads:
+                    db.session.rollback()
+                    break
+                summary[reason]["threads"] += len(threads)
+                for table, count in _delete(statements, threads, reason).items():
+                    summary[reason]["rows"][table] = summary[reason]["rows"].get(table, 0) + count
+                db.session.execute(db.text(CHAT_HANDLED_SQL[reason]), {**bounds, "threads": threads, "now": now})
+                db.session.commit()
+    return summary
+
+def run_checkpoint_retention(app):
+    """Background loop pruning checkpoints every CHECKPOINT_PRUNE_INTERVAL_SECONDS."""
+    logger.info("Checkpoint retention started")
+    while True:
+        time.sleep(settings.CHECKPOINT_PRUNE_INTERVAL_SECONDS)
+        with app.app_context():
+            try:
+                summary = prune_checkpoints()
+                logger.info(f"Checkpoint retention run: {summary}")
+            except Exception as e:
+                logger.error(f"Checkpoint retention failed: {str(e)}\n{traceback.format_exc()}")
+                db.session.rollback()
@@ -26,17 +26,142 @@ class Settings:
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "5432")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "support_app_db")
     DATABASE_URL: str = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+
+    # SQLAlchemy engine pool (per process: at most DB_POOL_SIZE + DB_MAX_OVERFLOW connections)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+    DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_QUERY_CACHE_SIZE: int = int(os.getenv("DB_QUERY_CACHE_SIZE", "1000"))  # compiled statement cache
+
+    # Checkpoint retention: compact finished tickets' threads to their latest checkpoint
+    # once settled, and drop resolved/escalated tickets' threads after the retention window;
+    # chat threads are compacted and dropped by the same settings, measured from their last message
+    CHECKPOINT_PRUNE_INTERVAL_SECONDS: float = float(os.getenv("CHECKPOINT_PRUNE_INTERVAL_SECONDS", "3600"))
+    CHECKPOINT_COMPACT_AFTER_SECONDS: int = int(os.getenv("CHECKPOINT_COMPACT_AFTER_SECONDS", "3600"))
+    CHECKPOINT_RETENTION_DAYS: int = int(os.getenv("CHECKPOINT_RETENTION_DAYS", "30"))
+    CHECKPOINT_PRUNE_BATCH_SIZE: int = int(os.getenv("CHECKPOINT_PRUNE_BATCH_SIZE", "200"))
+
+    # psycopg pool shared by the LangGraph checkpointers (per process: at most CHECKPOINT_POOL_MAX_SIZE)
+    CHECKPOINT_POOL_MIN_SIZE: int = int(os.getenv("CHECKPOINT_POOL_MIN_SIZE", "2"))
+    CHECKPOINT_POOL_MAX_SIZE: int = int(os.getenv("CHECKPOINT_POOL_MAX_SIZE", "10"))
+    CHECKPOINT_POOL_TIMEOUT_SECONDS: float = float(os.getenv("CHECKPOINT_POOL_TIMEOUT_SECONDS", "10"))
+    CHECKPOINT_POOL_MAX_IDLE_SECONDS: float = float(os.getenv("CHECKPOINT_POOL_MAX_IDLE_SECONDS", "300"))
+    CHECKPOINT_POOL_MAX_LIFETIME_SECONDS: float = float(os.getenv("CHECKPOINT_POOL_MAX_LIFETIME_SECONDS", "1800"))
+    CHECKPOINT_PREPARE_THRESHOLD: int = int(os.getenv("CHECKPOINT_PREPARE_THRESHOLD", "5"))  # server-side prepared statements
     
     # Mailgun settings
     MAILGUN_API_KEY = os.getenv("MAILGUN_API_KEY")
     MAILGUN_DOMAIN = os.getenv("MAILGUN_DOMAIN")
     MAILGUN_FROM_EMAIL = os.getenv("MAILGUN_FROM_EMAIL", f"Support Team <postmaster@{MAILGUN_DOMAIN}>")
+    # Point at a local stub (python -m utils.mailgun_stub) for tests
+    MAILGUN_API_BASE_URL: str = os.getenv("MAILGUN_API_BASE_URL", "https://api.mailgun.net/v3")
+    MAIL_HTTP_POOL_SIZE: int = int(os.getenv("MAIL_HTTP_POOL_SIZE", "10"))
+    MAIL_HTTP_TIMEOUT_SECONDS: float = float(os.getenv("MAIL_HTTP_TIMEOUT_SECONDS", "15"))
+    MAIL_DISPATCH_BATCH_SIZE: int = int(os.getenv("MAIL_DISPATCH_BATCH_SIZE", "50"))
+    MAIL_DISPATCH_POLL_SECONDS: float = float(os.getenv("MAIL_DISPATCH_POLL_SECONDS", "2"))
+    MAIL_MAX_ATTEMPTS: int = int(os.getenv("MAIL_MAX_ATTEMPTS", "5"))
+    MAIL_RETRY_BACKOFF_SECONDS: int = int(os.getenv("MAIL_RETRY_BACKOFF_SECONDS", "30"))
+    # Merge identical notifications to different recipients into one Mailgun call
+    MAIL_BATCHING_ENABLED: bool = os.getenv("MAIL_BATCHING_ENABLED", "false").lower() == "true"
 
     # JWT Settings
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "5p74$@hbo5apgZqzM@BVhiHG!RRDMn&P")
     JWT_ALGORITHM: str = "HS256"
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     JWT_REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Verified access tokens (claims + user id) cached per process
+    TOKEN_CACHE_MAX_ENTRIES: int = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+    TOKEN_CACHE_TTL_SECONDS: float = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+
+    # Ticket details served to the chat on join, cached per process
+    TICKET_CACHE_MAX_ENTRIES: int = int(os.getenv("TICKET_CACHE_MAX_ENTRIES", "1000"))
+    TICKET_CACHE_TTL_SECONDS: float = float(os.getenv("TICKET_CACHE_TTL_SECONDS", "60"))
+
+    # Socket.IO backplane shared by all server processes: "" (single process), "postgres" or a queue URL
+    SOCKETIO_MESSAGE_QUEUE: str = os.getenv("SOCKETIO_MESSAGE_QUEUE", "")
+    SOCKETIO_CHANNEL: str = os.getenv("SOCKETIO_CHANNEL", "socketio")
+    # How long oversized backplane messages are kept for listeners to read
+    SOCKETIO_MESSAGE_RETENTION_SECONDS: int = int(os.getenv("SOCKETIO_MESSAGE_RETENTION_SECONDS", "60"))
+    # NOTIFY channel carrying cache invalidations between processes when SOCKETIO_MESSAGE_QUEUE is set
+    CACHE_INVALIDATION_CHANNEL: str = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache_invalidation")
+
+    # Window over which successive changes to a ticket are merged into one ticket_update frame
+    TICKET_UPDATE_COALESCE_SECONDS: float = float(os.getenv("TICKET_UPDATE_COALESCE_SECONDS", "0.25"))
+
+    # Ticket listing pagination
+    INCIDENTS_PAGE_SIZE: int = int(os.getenv("INCIDENTS_PAGE_SIZE", "100"))
+    INCIDENTS_MAX_PAGE_SIZE: int = int(os.getenv("INCIDENTS_MAX_PAGE_SIZE", "500"))
+
+    # Rebuild the materialized ticket status counters from the tickets table this often
+    STATUS_COUNT_RECONCILE_SECONDS: float = float(os.getenv("STATUS_COUNT_RECONCILE_SECONDS", "3600"))
+
+    # Comma-separated emails allowed to call /api/admin endpoints
+    ADMIN_EMAILS: list = [e.strip() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()]
+
+    # L2 model artifacts (built offline with `python -m agents.l2_training`); workers only
+    # train in-process when artifacts are missing if L2_TRAIN_ON_MISSING=true
+    L2_TRAINING_FILE: str = os.getenv("L2_TRAINING_FILE", "./training/test_excel.xlsx")
+    L2_ARTIFACT_DIR: str = os.getenv("L2_ARTIFACT_DIR", "./model_artifacts")
+    L2_TRAIN_ON_MISSING: bool = os.getenv("L2_TRAIN_ON_MISSING", "false").lower() == "true"
+
+    # Log one JSON span per ticket graph node run on the graph.spans logger
+    GRAPH_SPAN_LOGGING: bool = os.getenv("GRAPH_SPAN_LOGGING", "true").lower() == "true"
+    # Bearer token required by /metrics; empty leaves it open for the Prometheus scraper
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+
+    # Ingestion-time clustering of near-duplicate tickets (MinHash LSH over recent descriptions)
+    CLUSTERING_ENABLED: bool = os.getenv("CLUSTERING_ENABLED", "true").lower() == "true"
+    CLUSTER_WINDOW_SECONDS: int = int(os.getenv("CLUSTER_WINDOW_SECONDS", "3600"))
+    CLUSTER_SIMILARITY_THRESHOLD: float = float(os.getenv("CLUSTER_SIMILARITY_THRESHOLD", "0.8"))
+    CLUSTER_SHINGLE_SIZE: int = int(os.getenv("CLUSTER_SHINGLE_SIZE", "3"))
+    CLUSTER_MINHASH_PERMUTATIONS: int = int(os.getenv("CLUSTER_MINHASH_PERMUTATIONS", "64"))
+    CLUSTER_LSH_BANDS: int = int(os.getenv("CLUSTER_LSH_BANDS", "16"))
+    # Followers wait this long for the leader's L2 prediction before running L2 themselves
+    CLUSTER_LEADER_WAIT_SECONDS: int = int(os.getenv("CLUSTER_LEADER_WAIT_SECONDS", "300"))
+    CLUSTER_FOLLOWER_RETRY_SECONDS: int = int(os.getenv("CLUSTER_FOLLOWER_RETRY_SECONDS", "5"))
+
+    # Cache of L2 predictions keyed by normalized ticket text (per process, per artifact key)
+    RESOLUTION_CACHE_ENABLED: bool = os.getenv("RESOLUTION_CACHE_ENABLED", "true").lower() == "true"
+    RESOLUTION_CACHE_MAX_ENTRIES: int = int(os.getenv("RESOLUTION_CACHE_MAX_ENTRIES", "5000"))
+    RESOLUTION_CACHE_TTL_SECONDS: float = float(os.getenv("RESOLUTION_CACHE_TTL_SECONDS", "86400"))
+    # Also serve SimHash near duplicates whose fraction of matching bits reaches the threshold
+    RESOLUTION_CACHE_NEAR_DUPLICATES: bool = os.getenv("RESOLUTION_CACHE_NEAR_DUPLICATES", "false").lower() == "true"
+    RESOLUTION_CACHE_SIMILARITY_THRESHOLD: float = float(os.getenv("RESOLUTION_CACHE_SIMILARITY_THRESHOLD", "0.9"))
+
+    # Embedding cache in front of the Azure embeddings endpoint
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache/embeddings.sqlite3")
+    EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+
+    # FAISS index and incremental ingestion of resolved tickets
+    FAISS_INDEX_DIR: str = os.getenv("FAISS_INDEX_DIR", "./faiss_sample_db")
+    FAISS_DELTA_DIR: str = os.getenv("FAISS_DELTA_DIR", "./faiss_sample_db_deltas")
+    FAISS_INGEST_BATCH_SIZE: int = int(os.getenv("FAISS_INGEST_BATCH_SIZE", "16"))
+    FAISS_INGEST_FLUSH_SECONDS: float = float(os.getenv("FAISS_INGEST_FLUSH_SECONDS", "30"))
+    # Save a compacted base once this many deltas sit on top of the current one
+    FAISS_COMPACT_AFTER_DELTAS: int = int(os.getenv("FAISS_COMPACT_AFTER_DELTAS", "50"))
+    # Compacted deltas are kept this long so slower workers can still sync them
+    FAISS_DELTA_RETENTION_SECONDS: float = float(os.getenv("FAISS_DELTA_RETENTION_SECONDS", "3600"))
+
+    # Ticket processing queue
+    JOB_WORKER_CONCURRENCY: int = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1.0"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BACKOFF_SECONDS: int = int(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "10"))
+    JOB_STALE_AFTER_SECONDS: int = int(os.getenv("JOB_STALE_AFTER_SECONDS", "900"))
+
+    # Background RCA/PM enrichment
+    RCA_PM_MAX_WORKERS: int = int(os.getenv("RCA_PM_MAX_WORKERS", "2"))
+
+    # Ticket chatbot memory: "postgres" (shared checkpoint pool), "sqlite" (local file) or "memory"
+    CHAT_MEMORY_BACKEND: str = os.getenv("CHAT_MEMORY_BACKEND", "postgres").lower()
+    CHAT_MEMORY_SQLITE_PATH: str = os.getenv("CHAT_MEMORY_SQLITE_PATH", "./chat_memory/chat.sqlite3")
+    # Token budget for the conversation turns sent to the LLM (ticket context and summary excluded)
+    CHAT_MAX_PROMPT_TOKENS: int = int(os.getenv("CHAT_MAX_PROMPT_TOKENS", "3000"))
+    # Once a thread holds more turns than this, older ones are folded into a running summary
+    CHAT_SUMMARIZE_AFTER_MESSAGES: int = int(os.getenv("CHAT_SUMMARIZE_AFTER_MESSAGES", "20"))
+    CHAT_KEEP_RECENT_MESSAGES: int = int(os.getenv("CHAT_KEEP_RECENT_MESSAGES", "8"))
 
 settings = Settings()
 
@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from core.config import settings
+from core.pools import engine_options
 
 db = SQLAlchemy()
 
@@ -7,10 +8,20 @@ def init_db(app):
     """Initialize the database with the Flask app"""
     app.config["SQLALCHEMY_DATABASE_URI"] = settings.DATABASE_URL
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options()
     db.init_app(app)
     
     # Import models to ensure they are registered
-    from core.models import User, RefreshToken, Ticket
+    from core.models import (
+        User, RefreshToken, RevokedAccessToken, Ticket, TicketStatusCount, ProcessingJob, OutboxEmail,
+        IncidentCluster, IncidentClusterBand, IncidentClusterMember, FaissPendingDocument,
+        CheckpointRetentionWatermark, ChatThread
+    )
+    import core.status_counts  # registers the session hooks that maintain TicketStatusCount
     
     with app.app_context():
-        db.create_all()
\ No newline at end of file
+        db.create_all()
+        # create_all skips indexes added to tables that already exist
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=db.engine, checkfirst=True)
\ No newline at end of file
@@ -0,0 +1,210 @@
+"""
+Ingestion-time clustering of near-duplicate tickets into incidents.
+
+Each incoming description gets a MinHash signature over its word shingles. The
+signature is split into LSH bands stored in `incident_cluster_bands`, so tickets
+from the last CLUSTER_WINDOW_SECONDS that share a band with the new one are found by
+an indexed lookup. The best candidate whose estimated Jaccard similarity reaches
+CLUSTER_SIMILARITY_THRESHOLD takes the ticket as a follower; otherwise the ticket
+leads a new cluster.
+
+The leader runs L2 and RCA/PM as usual and records the results on its cluster.
+Followers run the same graph but inherit the leader's first L2 prediction (so they
+get the same email) and its RCA/PM, instead of calling the models themselves.
+
+Clusters that leave the window lose their bands, so no new ticket can join them. Once
+every member's graph run has also finished, the cluster and its member rows are
+deleted.
+"""
+import hashlib
+import random
+import re
+import time
+import traceback
+import unicodedata
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects.postgresql import insert
+
+from core.checkpoint_retention import FINISHED_CONDITION
+from core.config import settings
+from core.database import db
+from core.models import IncidentCluster, IncidentClusterBand, IncidentClusterMember
+from utils import metrics
+from utils.logger import logger
+
+# Universal hashing modulo a Mersenne prime; the fixed seed keeps signatures stable across processes
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+    for _ in range(settings.CLUSTER_MINHASH_PERMUTATIONS)
+]
+
+assignments = metrics.counter(
+    "cluster_assignments_total",
+    "Tickets assigned to incident clusters at ingestion, by role (leader, follower)",
+    labels=("role",)
+)
+
+# Clusters outside the window none of whose member tickets is still being processed
+FINISHED_CLUSTERS_SQL = f"""
+DELETE FROM incident_clusters c
+WHERE c.last_seen_at < :window_start AND NOT EXISTS (
+    SELECT 1 FROM incident_cluster_members m JOIN tickets t ON t.sys_id = m.ticket_id
+    WHERE m.cluster_id = c.id AND NOT {FINISHED_CONDITION}
+)
+"""
+
+def shingles(text: str) -> set:
+    words = re.findall(r"\w+", unicodedata.normalize("NFC", text or "").casefold())
+    size = settings.CLUSTER_SHINGLE_SIZE
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def minhash(text: str) -> list:
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big") % _PRIME
+        for shingle in shingles(text)
+    ]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+def similarity(signature: list, other: list) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(1 for x, y in zip(signature, other) if x == y) / len(signature)
+
+def band_keys(signature: list) -> list:
+    rows = len(signature) // settings.CLUSTER_LSH_BANDS
+    keys = []
+    for band in range(settings.CLUSTER_LSH_BANDS):
+        values = ",".join(str(v) for v in signature[band * rows:(band + 1) * rows])
+        digest = hashlib.blake2b(f"{band}:{values}".encode("utf-8"), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "big", signed=True))
+    return keys
+
+def assign_cluster(ticket_id: str, description: str) -> tuple:
+    """
+    Put a new ticket into a recent cluster of near-duplicates or start one. Joins the
+    caller's transaction and does not commit.
+
+    Returns:
+        tuple: (cluster_id, is_leader)
+    """
+    signature = minhash(description)
+    keys = band_keys(signature)
+    window_start = datetime.utcnow() - timedelta(seconds=settings.CLUSTER_WINDOW_SECONDS)
+    candidates = (
+        IncidentCluster.query
+        .join(IncidentClusterBand, IncidentClusterBand.cluster_id == IncidentCluster.id)
+        .filter(IncidentClusterBand.band_key.in_(keys), IncidentCluster.last_seen_at >= window_start)
+        .distinct()
+        .all()
+    )
+    best, best_similarity = None, settings.CLUSTER_SIMILARITY_THRESHOLD
+    for cluster in candidates:
+        score = similarity(signature, cluster.signature)
+        if score >= best_similarity:
+            best, best_similarity = cluster, score
+
+    if best is not None:
+        # Row lock serializes concurrent joins and orders them against the leader recording its
+        # RCA/PM (see record_cluster_rca_pm); populate_existing reloads the row the candidates
+        # query already put in the session, so the count is incremented from its locked value
+        cluster = db.session.get(IncidentCluster, best.id, with_for_update=True, populate_existing=True)
+        cluster.member_count += 1
+        cluster.last_seen_at = datetime.utcnow()
+        db.session.add(IncidentClusterMember(ticket_id=ticket_id, cluster_id=cluster.id, is_leader=False))
+        db.session.flush()
+        assignments.inc(role="follower")
+        logger.info(f"Ticket {ticket_id} joined incident cluster {cluster.id} (similarity {best_similarity:.2f})")
+        return cluster.id, False
+
+    cluster = IncidentCluster(leader_ticket_id=ticket_id, signature=signature)
+    db.session.add(cluster)
+    db.session.flush()
+    db.session.add(IncidentClusterMember(ticket_id=ticket_id, cluster_id=cluster.id, is_leader=True))
+    db.session.execute(
+        insert(IncidentClusterBand.__table__)
+        .values([{"band_key": key, "cluster_id": cluster.id, "created_at": cluster.created_at} for key in set(keys)])
+        .on_conflict_do_nothing()
+    )
+    assignments.inc(role="leader")
+    return cluster.id, True
+
+def cluster_prediction(cluster_id: int):
+    """The leader's L2 prediction, or None while the leader has not produced one."""
+    cluster = db.session.get(IncidentCluster, cluster_id)
+    return cluster.prediction if cluster else None
+
+def cluster_age_seconds(cluster_id: int) -> float:
+    """Seconds since the cluster was created; infinite once its row is gone, so waiting followers stop."""
+    cluster = db.session.get(IncidentCluster, cluster_id)
+    return (datetime.utcnow() - cluster.created_at).total_seconds() if cluster else float("inf")
+
+def record_cluster_prediction(cluster_id: int, prediction: dict):
+    """Store the first L2 prediction made for a cluster and commit."""
+    db.session.execute(
+        IncidentCluster.__table__.update()
+        .where(IncidentCluster.id == cluster_id, IncidentCluster.prediction.is_(None))
+        .values(prediction=prediction)
+    )
+    db.session.commit()
+
+def record_cluster_rca_pm(cluster_id: int, rca: str, pm: str) -> list:
+    """
+    Store the cluster's RCA/PM (first writer wins). Does not commit.
+
+    Returns:
+        list: sys_ids of the followers that joined so far, which should receive it
+    """
+    cluster = db.session.get(IncidentCluster, cluster_id, with_for_update=True)
+    if cluster is None or cluster.rca is not None:
+        return []
+    cluster.rca = rca
+    cluster.pm = pm
+    rows = (
+        IncidentClusterMember.query
+        .filter_by(cluster_id=cluster_id, is_leader=False)
+        .with_entities(IncidentClusterMember.ticket_id)
+        .all()
+    )
+    return [row.ticket_id for row in rows]
+
+def cluster_rca_pm(cluster_id: int):
+    """(rca, pm) recorded for the cluster, or None."""
+    cluster = db.session.get(IncidentCluster, cluster_id)
+    if cluster is None or cluster.rca is None:
+        return None
+    return cluster.rca, cluster.pm
+
+def prune_clusters() -> dict:
+    """
+    Delete the LSH bands of clusters outside the clustering window, and the clusters
+    (with their member rows) whose members have all finished.
+
+    Returns:
+        dict: Number of bands and clusters removed
+    """
+    window_start = datetime.utcnow() - timedelta(seconds=settings.CLUSTER_WINDOW_SECONDS)
+    stale = db.select(IncidentCluster.id).where(IncidentCluster.last_seen_at < window_start)
+    bands = db.session.execute(
+        IncidentClusterBand.__table__.delete().where(IncidentClusterBand.cluster_id.in_(stale))
+    ).rowcount
+    # Members and any remaining bands go with the cluster (ON DELETE CASCADE)
+    clusters = db.session.execute(db.text(FINISHED_CLUSTERS_SQL), {"window_start": window_start}).rowcount
+    db.session.commit()
+    return {"bands": bands, "clusters": clusters}
+
+def run_cluster_pruner(app):
+    """Background loop pruning stale LSH bands and finished clusters every CLUSTER_WINDOW_SECONDS."""
+    logger.info("Incident cluster pruner started")
+    while True:
+        time.sleep(settings.CLUSTER_WINDOW_SECONDS)
+        with app.app_context():
+            try:
+                removed = prune_clusters()
+                logger.info(f"Pruned {removed['bands']} incident cluster bands and {removed['clusters']} finished clusters")
+            except Exception as e:
+                logger.error(f"Incident cluster pruning failed: {str(e)}\n{traceback.format_exc()}")
+                db.session.rollback()
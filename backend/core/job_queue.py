@@ -0,0 +1,133 @@
+"""
+Durable, Postgres-backed job queue for work that must not run inside an HTTP request.
+
+Jobs are rows in `processing_jobs`. Workers claim them with SELECT ... FOR UPDATE
+SKIP LOCKED, so any number of greenlets and processes can share the table safely.
+Jobs left in `running` by a crashed worker are picked up again once they are older
+than JOB_STALE_AFTER_SECONDS.
+"""
+import threading
+import traceback
+from datetime import datetime, timedelta
+
+from core.config import settings
+from core.database import db
+from core.models import ProcessingJob
+from utils.logger import logger
+
+_handlers = {}
+_wakeup = threading.Event()
+
+class JobDeferred(Exception):
+    """Raised by a handler that cannot run yet; the job is requeued without using up an attempt."""
+    def __init__(self, delay_seconds: float, reason: str = ""):
+        super().__init__(reason)
+        self.delay_seconds = delay_seconds
+
+def register_job_handler(kind: str):
+    """Register a function `handler(payload, socketio) -> dict` for a job kind."""
+    def decorator(f):
+        _handlers[kind] = f
+        return f
+    return decorator
+
+def enqueue_job(kind: str, ticket_id: str, user_email: str, payload: dict = None, commit: bool = True) -> ProcessingJob:
+    """Add a job to the queue. With commit=False it joins the caller's transaction."""
+    job = ProcessingJob(
+        kind=kind,
+        ticket_id=ticket_id,
+        user_email=user_email,
+        payload=payload or {},
+        status="queued",
+        run_after=datetime.utcnow()
+    )
+    db.session.add(job)
+    if commit:
+        db.session.commit()
+    else:
+        db.session.flush()
+    _wakeup.set()
+    logger.info(f"Enqueued {kind} job {job.id} for ticket {ticket_id}")
+    return job
+
+def claim_job():
+    """Lock and mark the next runnable job as running, or return None."""
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=settings.JOB_STALE_AFTER_SECONDS)
+    job = (
+        ProcessingJob.query
+        .filter(db.or_(
+            db.and_(ProcessingJob.status == "queued", ProcessingJob.run_after <= now),
+            db.and_(ProcessingJob.status == "running", ProcessingJob.started_at < stale_before)
+        ))
+        .order_by(ProcessingJob.run_after)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if not job:
+        db.session.commit()
+        return None
+    job.status = "running"
+    job.started_at = now
+    job.attempts += 1
+    db.session.commit()
+    return job
+
+def run_job(job: ProcessingJob, socketio):
+    """Run a claimed job and record its outcome, rescheduling it on failure."""
+    job_id = job.id
+    handler = _handlers.get(job.kind)
+    try:
+        if not handler:
+            raise ValueError(f"No handler registered for job kind '{job.kind}'")
+        result = handler(job.payload, socketio)
+        job = db.session.get(ProcessingJob, job_id)
+        job.status = "done"
+        job.result = result
+        job.error = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        logger.info(f"Job {job_id} ({job.kind}) completed")
+    except JobDeferred as e:
+        db.session.rollback()
+        job = db.session.get(ProcessingJob, job_id)
+        job.status = "queued"
+        job.attempts -= 1
+        job.run_after = datetime.utcnow() + timedelta(seconds=e.delay_seconds)
+        db.session.commit()
+        logger.info(f"Job {job_id} deferred for {e.delay_seconds}s: {e}")
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {str(e)}\n{traceback.format_exc()}")
+        db.session.rollback()
+        job = db.session.get(ProcessingJob, job_id)
+        job.error = str(e)
+        if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+            job.status = "failed"
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = "queued"
+            backoff = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+            job.run_after = datetime.utcnow() + timedelta(seconds=backoff)
+        db.session.commit()
+
+def _worker_loop(app, socketio, worker_id: int):
+    logger.info(f"Job worker {worker_id} started")
+    while True:
+        job = None
+        with app.app_context():
+            try:
+                job = claim_job()
+                if job:
+                    run_job(job, socketio)
+            except Exception as e:
+                logger.error(f"Job worker {worker_id} error: {str(e)}\n{traceback.format_exc()}")
+                db.session.rollback()
+        if not job:
+            _wakeup.wait(timeout=settings.JOB_POLL_INTERVAL_SECONDS)
+            _wakeup.clear()
+
+def start_job_workers(app, socketio):
+    """Start JOB_WORKER_CONCURRENCY background workers in this process."""
+    for worker_id in range(settings.JOB_WORKER_CONCURRENCY):
+        socketio.start_background_task(_worker_loop, app, socketio, worker_id)
+    logger.info(f"Started {settings.JOB_WORKER_CONCURRENCY} job workers")
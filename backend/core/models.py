@@ -38,8 +38,23 @@ class RefreshToken(db.Model):
     def __repr__(self):
         return f"<RefreshToken user_id={self.user_id}>"
 
+class RevokedAccessToken(db.Model):
+    """Access token revoked by logout; rows are deleted once the token has expired"""
+    __tablename__ = "revoked_access_tokens"
+    
+    token_hash = db.Column(db.String(64), primary_key=True)  # SHA-256 hex digest of the token
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Ticket(db.Model):
     __tablename__ = "tickets"
+    __table_args__ = (
+        # Keyset pagination over a user's tickets and per-source listings
+        db.Index("ix_tickets_user_id_created_at", "user_id", "created_at", "id"),
+        db.Index("ix_tickets_user_id_source", "user_id", "source"),
+        # Checkpoint retention scans tickets changed since its watermark
+        db.Index("ix_tickets_updated_at_id", "updated_at", "id"),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     sys_id = db.Column(db.String(50), unique=True, nullable=False)  
@@ -62,4 +77,120 @@ class Ticket(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __repr__(self):
-        return f"<Ticket sys_id={self.sys_id}>"
\ No newline at end of file
+        return f"<Ticket sys_id={self.sys_id}>"
+
+class TicketStatusCount(db.Model):
+    """Materialized count of a user's tickets per source and status, kept by core.status_counts"""
+    __tablename__ = "ticket_status_counts"
+    
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    source = db.Column(db.String(50), primary_key=True, default="")  # "" when the ticket has no source
+    status = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<TicketStatusCount user_id={self.user_id} source={self.source} status={self.status} count={self.count}>"
+
+class ProcessingJob(db.Model):
+    __tablename__ = "processing_jobs"
+    __table_args__ = (
+        db.Index("ix_processing_jobs_status_run_after", "status", "run_after"),
+    )
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = db.Column(db.String(50), nullable=False)
+    ticket_id = db.Column(db.String(50), nullable=False, index=True)
+    user_email = db.Column(db.String(120), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(20), nullable=False, default="queued")  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<ProcessingJob id={self.id} kind={self.kind} status={self.status}>"
+
+class OutboxEmail(db.Model):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        db.Index("ix_email_outbox_state_next_attempt", "state", "next_attempt_at"),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(120), nullable=False)
+    ticket_id = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(100), nullable=False)  # Ticket status that selects the template
+    details = db.Column(db.JSON, nullable=False, default=dict)
+    state = db.Column(db.String(20), nullable=False, default="pending")  # pending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<OutboxEmail id={self.id} ticket_id={self.ticket_id} state={self.state}>"
+
+class IncidentCluster(db.Model):
+    """Tickets grouped at ingestion as near-duplicates of a leader ticket (see core.incident_clusters)"""
+    __tablename__ = "incident_clusters"
+    
+    id = db.Column(db.Integer, primary_key=True)
+    leader_ticket_id = db.Column(db.String(50), nullable=False)
+    signature = db.Column(db.JSON, nullable=False)  # MinHash signature of the leader's description
+    member_count = db.Column(db.Integer, nullable=False, default=1)
+    prediction = db.Column(db.JSON, nullable=True)  # Leader's first L2 prediction, inherited by followers
+    rca = db.Column(db.Text, nullable=True)
+    pm = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_seen_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f"<IncidentCluster id={self.id} leader={self.leader_ticket_id} members={self.member_count}>"
+
+class IncidentClusterBand(db.Model):
+    """LSH band of a recent cluster's signature; rows older than the clustering window are pruned"""
+    __tablename__ = "incident_cluster_bands"
+    
+    band_key = db.Column(db.BigInteger, primary_key=True)
+    cluster_id = db.Column(db.Integer, db.ForeignKey("incident_clusters.id", ondelete="CASCADE"), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class IncidentClusterMember(db.Model):
+    __tablename__ = "incident_cluster_members"
+    
+    ticket_id = db.Column(db.String(50), primary_key=True)
+    cluster_id = db.Column(db.Integer, db.ForeignKey("incident_clusters.id", ondelete="CASCADE"), nullable=False, index=True)
+    is_leader = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class FaissPendingDocument(db.Model):
+    """Resolved ticket waiting to be embedded into a FAISS delta (see agents.vector_index)"""
+    __tablename__ = "faiss_pending_documents"
+    
+    id = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.Text, nullable=False)
+    priority = db.Column(db.String(50), nullable=True)
+    classified_team = db.Column(db.String(100), nullable=True)
+    resolution = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CheckpointRetentionWatermark(db.Model):
+    """Last ticket (by updated_at, id) a checkpoint retention pass has handled"""
+    __tablename__ = "checkpoint_retention_watermarks"
+    
+    name = db.Column(db.String(20), primary_key=True)  # "compacted" or "dropped"
+    updated_at = db.Column(db.DateTime, nullable=False)
+    ticket_id = db.Column(db.Integer, nullable=False, default=0)
+
+class ChatThread(db.Model):
+    """Activity of a ticket's chat memory thread, used by checkpoint retention"""
+    __tablename__ = "chat_threads"
+    
+    thread_id = db.Column(db.String(50), primary_key=True)  # The ticket's sys_id
+    last_message_at = db.Column(db.DateTime, nullable=False, index=True)
+    compacted_at = db.Column(db.DateTime, nullable=True)  # Last compaction; NULL until the first
@@ -0,0 +1,135 @@
+"""
+Per-node latency, LLM token, embedding, DB and error measurements for the ticket graph.
+
+`instrument_node` wraps each node in graph.create_graph. While a node runs, a span in
+a context variable collects:
+  - LLM calls and token usage, from a LangChain callback handler attached to every
+    model run started in this context (register_configure_hook)
+  - embedding calls, reported by agents.embedding_cache (remote calls and cache hits)
+  - DB round trips, counted on the SQLAlchemy engine; checkpointer queries go through
+    psycopg directly and are not included
+  - errors: exceptions the node raised, or a returned status of "error"
+
+Finished spans update the `graph_node_*` metrics (exported by /metrics) and are logged
+as one JSON object per line on the `graph.spans` logger, carrying the ticket id.
+Work a node starts on other threads is attributed to it only when the thread runs in
+a copy of the node's context (see agents.l2_agent.run_parallel_predictions).
+"""
+import json
+import logging
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from core.config import settings
+from utils import metrics
+
+span_logger = logging.getLogger("graph.spans")
+
+node_seconds = metrics.histogram("graph_node_seconds", "Wall time of one graph node run", labels=("node",))
+node_errors = metrics.counter("graph_node_errors_total", "Graph node runs that raised or returned status error", labels=("node",))
+node_llm_calls = metrics.counter("graph_node_llm_calls_total", "LLM calls made by graph nodes", labels=("node",))
+node_llm_tokens = metrics.counter(
+    "graph_node_llm_tokens_total", "LLM tokens used by graph nodes, by type (prompt, completion)", labels=("node", "type")
+)
+node_embedding_calls = metrics.counter(
+    "graph_node_embedding_calls_total", "Embedding lookups by graph nodes, by source (remote, cache)", labels=("node", "source")
+)
+node_db_queries = metrics.counter("graph_node_db_queries_total", "SQL statements run by graph nodes", labels=("node",))
+
+_span = ContextVar("graph_node_span", default=None)
+_token_handler = ContextVar("graph_node_token_handler", default=None)
+register_configure_hook(_token_handler, inheritable=True)
+
+def _usage(response) -> tuple:
+    """(prompt_tokens, completion_tokens) reported for one LLM run."""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt += metadata.get("input_tokens", 0)
+            completion += metadata.get("output_tokens", 0)
+    return prompt, completion
+
+class _TokenUsageHandler(BaseCallbackHandler):
+    def on_llm_end(self, response, **kwargs):
+        span = _span.get()
+        if span is None:
+            return
+        prompt, completion = _usage(response)
+        span["llm_calls"] += 1
+        span["prompt_tokens"] += prompt
+        span["completion_tokens"] += completion
+
+_handler = _TokenUsageHandler()
+
+def record_embedding_call(source: str, count: int = 1):
+    """Attribute embedding lookups ("remote" or "cache") to the running node, if any."""
+    span = _span.get()
+    if span is not None:
+        span["embedding_calls"][source] = span["embedding_calls"].get(source, 0) + count
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    span = _span.get()
+    if span is not None:
+        span["db_queries"] += 1
+
+def _finish(span: dict):
+    node = span["node"]
+    node_seconds.observe(span["duration_seconds"], node=node)
+    if span["error"]:
+        node_errors.inc(node=node)
+    if span["llm_calls"]:
+        node_llm_calls.inc(span["llm_calls"], node=node)
+        node_llm_tokens.inc(span["prompt_tokens"], node=node, type="prompt")
+        node_llm_tokens.inc(span["completion_tokens"], node=node, type="completion")
+    for source, count in span["embedding_calls"].items():
+        node_embedding_calls.inc(count, node=node, source=source)
+    if span["db_queries"]:
+        node_db_queries.inc(span["db_queries"], node=node)
+    if settings.GRAPH_SPAN_LOGGING:
+        span_logger.info(json.dumps(span, default=str))
+
+def instrument_node(name: str, node):
+    """Wrap a graph node so each run is measured and reported as a span."""
+    @wraps(node)
+    def wrapper(state):
+        span = {
+            "node": name,
+            "ticket_id": state.get("ticket_id"),
+            "started_at": datetime.utcnow().isoformat(),
+            "duration_seconds": 0.0,
+            "llm_calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "embedding_calls": {},
+            "db_queries": 0,
+            "error": None
+        }
+        span_token = _span.set(span)
+        handler_token = _token_handler.set(_handler)
+        start = time.perf_counter()
+        try:
+            result = node(state)
+            if isinstance(result, dict) and result.get("status") == "error":
+                span["error"] = "status error"
+            return result
+        except Exception as e:
+            span["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span["duration_seconds"] = time.perf_counter() - start
+            _token_handler.reset(handler_token)
+            _span.reset(span_token)
+            _finish(span)
+    return wrapper
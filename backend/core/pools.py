@@ -0,0 +1,85 @@
+"""
+Connection pool configuration for the two pools each process opens against Postgres:
+the Flask-SQLAlchemy engine pool and the psycopg pool behind the LangGraph checkpointers.
+
+Both are sized from Settings, so the worst case per process is
+DB_POOL_SIZE + DB_MAX_OVERFLOW + CHECKPOINT_POOL_MAX_SIZE connections; multiply by the
+number of server processes and keep it under Postgres `max_connections`.
+"""
+import threading
+
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
+
+from core.config import settings
+from utils.logger import logger
+
+_checkpoint_pool = None
+_checkpoint_pool_lock = threading.Lock()
+
+def engine_options() -> dict:
+    """SQLALCHEMY_ENGINE_OPTIONS for the Flask-SQLAlchemy engine."""
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "query_cache_size": settings.DB_QUERY_CACHE_SIZE
+    }
+
+def get_checkpoint_pool() -> ConnectionPool:
+    """The process-wide psycopg pool for checkpointers, opened on first use."""
+    global _checkpoint_pool
+    if _checkpoint_pool is None:
+        with _checkpoint_pool_lock:
+            if _checkpoint_pool is None:
+                _checkpoint_pool = ConnectionPool(
+                    settings.DATABASE_URL,
+                    min_size=settings.CHECKPOINT_POOL_MIN_SIZE,
+                    max_size=settings.CHECKPOINT_POOL_MAX_SIZE,
+                    timeout=settings.CHECKPOINT_POOL_TIMEOUT_SECONDS,
+                    max_idle=settings.CHECKPOINT_POOL_MAX_IDLE_SECONDS,
+                    max_lifetime=settings.CHECKPOINT_POOL_MAX_LIFETIME_SECONDS,
+                    check=ConnectionPool.check_connection if settings.DB_POOL_PRE_PING else None,
+                    kwargs={
+                        # PostgresSaver expects autocommit connections returning dict rows
+                        "autocommit": True,
+                        "prepare_threshold": settings.CHECKPOINT_PREPARE_THRESHOLD,
+                        "row_factory": dict_row
+                    },
+                    name="checkpoint",
+                    open=True
+                )
+                logger.info(
+                    f"Opened checkpoint pool (min={settings.CHECKPOINT_POOL_MIN_SIZE}, "
+                    f"max={settings.CHECKPOINT_POOL_MAX_SIZE})"
+                )
+    return _checkpoint_pool
+
+def pool_stats(engine) -> dict:
+    """Current utilization of the SQLAlchemy engine pool and the checkpoint pool."""
+    pool = engine.pool
+    engine_capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    checked_out = pool.checkedout()
+    stats = {
+        "sqlalchemy": {
+            "pool_size": pool.size(),
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "checked_out": checked_out,
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "utilization": checked_out / engine_capacity if engine_capacity else 0.0
+        },
+        "checkpoint": None,
+        "max_connections_per_process": engine_capacity + settings.CHECKPOINT_POOL_MAX_SIZE
+    }
+    if _checkpoint_pool is not None:
+        checkpoint = _checkpoint_pool.get_stats()
+        in_use = checkpoint.get("pool_size", 0) - checkpoint.get("pool_available", 0)
+        stats["checkpoint"] = {
+            **checkpoint,
+            "in_use": in_use,
+            "utilization": in_use / settings.CHECKPOINT_POOL_MAX_SIZE if settings.CHECKPOINT_POOL_MAX_SIZE else 0.0
+        }
+    return stats
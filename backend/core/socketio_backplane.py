@@ -0,0 +1,124 @@
+"""
+Socket.IO message queue backplane, so several server processes share rooms and emits.
+
+SOCKETIO_MESSAGE_QUEUE selects it:
+  - ""          single process, rooms live in memory (default)
+  - "postgres"  PostgresManager below: LISTEN/NOTIFY on the application database,
+                no extra service required
+  - any URL     passed to Flask-SocketIO as message_queue (redis://, amqp://, ...)
+
+NOTIFY payloads are limited to 8000 bytes; larger messages are stored in the unlogged
+`socketio_messages` table and only their id is sent, then read back by each listener.
+"""
+import json
+import select
+import threading
+import time
+
+import psycopg
+import socketio
+from psycopg import sql
+
+from core.config import settings
+from utils.logger import logger
+
+# Stay below Postgres' 8000 byte NOTIFY payload limit
+NOTIFY_MAX_BYTES = 7900
+LISTEN_POLL_SECONDS = 5
+RECONNECT_DELAY_SECONDS = 1
+
+CREATE_MESSAGES_TABLE = """
+CREATE UNLOGGED TABLE IF NOT EXISTS socketio_messages (
+    id BIGSERIAL PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+"""
+
+class PostgresManager(socketio.PubSubManager):
+    """Socket.IO client manager that relays messages between processes with LISTEN/NOTIFY."""
+    name = "postgres"
+
+    def __init__(self, url: str, channel: str = "socketio", write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.url = url
+        self._connection = None
+        self._connection_lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    def _publish_connection(self):
+        if self._connection is None or self._connection.closed:
+            self._connection = psycopg.connect(self.url, autocommit=True)
+            self._connection.execute(CREATE_MESSAGES_TABLE)
+        return self._connection
+
+    def _publish(self, data):
+        payload = json.dumps(data)
+        with self._connection_lock:
+            for attempt in range(2):
+                try:
+                    self._notify(self._publish_connection(), payload)
+                    return
+                except psycopg.OperationalError:
+                    self._connection = None
+                    if attempt:
+                        raise
+
+    def _notify(self, connection, payload: str):
+        if len(payload.encode()) > NOTIFY_MAX_BYTES:
+            message_id = connection.execute(
+                "INSERT INTO socketio_messages (payload) VALUES (%s) RETURNING id", (payload,)
+            ).fetchone()[0]
+            payload = json.dumps({"message_ref": message_id})
+            now = time.monotonic()
+            if now - self._last_cleanup > settings.SOCKETIO_MESSAGE_RETENTION_SECONDS:
+                self._last_cleanup = now
+                connection.execute(
+                    "DELETE FROM socketio_messages WHERE created_at < now() - make_interval(secs => %s)",
+                    (settings.SOCKETIO_MESSAGE_RETENTION_SECONDS,)
+                )
+        connection.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+
+    def _decode(self, connection, payload: str) -> dict:
+        message = json.loads(payload)
+        if "message_ref" in message:
+            row = connection.execute(
+                "SELECT payload FROM socketio_messages WHERE id = %s", (message["message_ref"],)
+            ).fetchone()
+            if row is None:
+                logger.warning(f"Socket.IO message {message['message_ref']} expired before it was read")
+                return None
+            message = json.loads(row[0])
+        return message
+
+    def _listen(self):
+        while True:
+            try:
+                with psycopg.connect(self.url, autocommit=True) as connection:
+                    connection.execute(CREATE_MESSAGES_TABLE)
+                    received = []
+                    connection.add_notify_handler(lambda notify: received.append(notify.payload))
+                    connection.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+                    while True:
+                        # Wait on the socket (green under eventlet), then let psycopg read the notifications
+                        readable, _, _ = select.select([connection.fileno()], [], [], LISTEN_POLL_SECONDS)
+                        if readable:
+                            connection.execute("SELECT 1")
+                        while received:
+                            message = self._decode(connection, received.pop(0))
+                            if message is not None:
+                                yield message
+            except psycopg.OperationalError as e:
+                logger.error(f"Socket.IO backplane connection lost: {str(e)}")
+                time.sleep(RECONNECT_DELAY_SECONDS)
+
+def socketio_queue_options() -> dict:
+    """Keyword arguments for SocketIO() that attach the configured message queue."""
+    queue = settings.SOCKETIO_MESSAGE_QUEUE
+    if not queue:
+        return {}
+    if settings.CHAT_MEMORY_BACKEND == "memory":
+        logger.warning("CHAT_MEMORY_BACKEND=memory keeps chat threads per process; use postgres with several workers")
+    if queue == "postgres":
+        return {"client_manager": PostgresManager(settings.DATABASE_URL, channel=settings.SOCKETIO_CHANNEL)}
+    return {"message_queue": queue, "channel": settings.SOCKETIO_CHANNEL}
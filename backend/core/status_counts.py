@@ -0,0 +1,188 @@
+"""
+Materialized per-user, per-source ticket status counters.
+
+Every flush that inserts, deletes or re-statuses a Ticket also upserts the matching
+`ticket_status_counts` rows in the same transaction, so the counters commit or roll
+back together with the tickets. Once the transaction commits, the deltas are pushed
+to the owner's `user:<id>` Socket.IO room as `ticket_state_count` events.
+
+Core statements that bypass the unit of work (see core.ticket_writer) report their
+changes through `adjust_status_counts()`. Anything else (bulk updates, raw SQL) is
+repaired by `rebuild_status_counts()`, which recomputes the table from `tickets`
+and runs periodically.
+"""
+import time
+import traceback
+from collections import defaultdict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.postgresql import insert
+
+from core.config import settings
+from core.database import db
+from core.models import Ticket, TicketStatusCount
+from utils.logger import logger
+
+_PENDING = "status_count_pending"
+_APPLIED = "status_count_applied"
+
+_socketio = None
+
+def init_status_counts(socketio):
+    """Publish committed counter deltas through this Socket.IO server."""
+    global _socketio
+    _socketio = socketio
+
+def user_room(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def _key(user_id, source, status) -> tuple:
+    return (user_id, source or "", status or "")
+
+def _committed_value(state, name: str):
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.added:
+        return None
+    return getattr(state.obj(), name)
+
+@event.listens_for(Ticket.status, "set", active_history=True)
+def _load_previous_status(target, value, oldvalue, initiator):
+    """No-op listener; active_history makes the old status available to the flush even after expiry."""
+
+@event.listens_for(db.session, "before_flush")
+def _collect_deltas(session, flush_context, instances):
+    deltas = defaultdict(int)
+    for obj in session.new:
+        if isinstance(obj, Ticket):
+            status = obj.status if obj.status is not None else Ticket.__table__.c.status.default.arg
+            deltas[_key(obj.user_id, obj.source, status)] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Ticket):
+            deltas[_key(obj.user_id, obj.source, obj.status)] -= 1
+    for obj in session.dirty:
+        if not isinstance(obj, Ticket) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[name].history.has_changes() for name in ("status", "source", "user_id")):
+            continue
+        deltas[_key(
+            _committed_value(state, "user_id"), _committed_value(state, "source"), _committed_value(state, "status")
+        )] -= 1
+        deltas[_key(obj.user_id, obj.source, obj.status)] += 1
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if deltas:
+        pending = session.info.setdefault(_PENDING, defaultdict(int))
+        for key, delta in deltas.items():
+            pending[key] += delta
+
+def _upsert_counts(connection, deltas: dict):
+    table = TicketStatusCount.__table__
+    for (user_id, source, status), delta in sorted(deltas.items()):
+        statement = insert(table).values(user_id=user_id, source=source, status=status, count=delta)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.source, table.c.status],
+            set_={"count": table.c.count + statement.excluded.count}
+        ))
+
+def _record_applied(session, deltas: dict):
+    applied = session.info.setdefault(_APPLIED, defaultdict(int))
+    for key, delta in deltas.items():
+        applied[key] += delta
+
+def adjust_status_counts(changes: list):
+    """
+    Apply counter changes for ticket writes made outside the ORM unit of work, in the
+    current transaction of db.session.
+
+    Args:
+        changes (list): (user_id, source, old_status, new_status) tuples; old_status is
+            None for an inserted ticket and new_status is None for a deleted one
+    """
+    deltas = defaultdict(int)
+    for user_id, source, old_status, new_status in changes:
+        if old_status == new_status:
+            continue
+        if old_status is not None:
+            deltas[_key(user_id, source, old_status)] -= 1
+        if new_status is not None:
+            deltas[_key(user_id, source, new_status)] += 1
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if deltas:
+        _upsert_counts(db.session.connection(), deltas)
+        _record_applied(db.session(), deltas)
+
+@event.listens_for(db.session, "after_flush")
+def _apply_deltas(session, flush_context):
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    _upsert_counts(session.connection(), pending)
+    _record_applied(session, pending)
+
+@event.listens_for(db.session, "after_commit")
+def _publish_deltas(session):
+    applied = session.info.pop(_APPLIED, None)
+    if not applied or _socketio is None:
+        return
+    changes_by_user = defaultdict(list)
+    for (user_id, source, status), delta in applied.items():
+        if delta and status:
+            changes_by_user[user_id].append({"source": source or None, "status": status.lower(), "delta": delta})
+    for user_id, changes in changes_by_user.items():
+        try:
+            _socketio.emit("ticket_state_count", {"changes": changes}, room=user_room(user_id))
+        except Exception as e:
+            logger.error(f"Error publishing status counts for user {user_id}: {str(e)}")
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _discard_deltas(session, previous_transaction):
+    session.info.pop(_PENDING, None)
+    session.info.pop(_APPLIED, None)
+
+def get_status_counts(user_id: int, source: str = None) -> dict:
+    """Status -> ticket count for a user, optionally for one source."""
+    query = (
+        TicketStatusCount.query
+        .filter(TicketStatusCount.user_id == user_id, TicketStatusCount.count != 0)
+        .with_entities(TicketStatusCount.status, TicketStatusCount.count)
+    )
+    if source:
+        query = query.filter(TicketStatusCount.source == source)
+    result = defaultdict(int)
+    for status, count in query.all():
+        if status:
+            result[status.lower()] += count
+    return dict(result)
+
+def rebuild_status_counts() -> int:
+    """Recompute every counter from the tickets table. Returns the number of counter rows."""
+    table = TicketStatusCount.__table__
+    source = db.func.coalesce(Ticket.source, "")
+    status = db.func.coalesce(Ticket.status, "")
+    # Writers upsert counters before they commit, so once the lock is held every
+    # committed ticket change is visible and no uncommitted one can add a delta.
+    db.session.execute(db.text("LOCK TABLE ticket_status_counts IN EXCLUSIVE MODE"))
+    db.session.execute(table.delete())
+    db.session.execute(table.insert().from_select(
+        ["user_id", "source", "status", "count"],
+        db.select(Ticket.user_id, source, status, db.func.count()).group_by(Ticket.user_id, source, status)
+    ))
+    rows = db.session.query(db.func.count()).select_from(table).scalar()
+    db.session.commit()
+    return rows
+
+def run_status_count_reconciler(app):
+    """Background loop rebuilding the counters every STATUS_COUNT_RECONCILE_SECONDS."""
+    logger.info("Status count reconciler started")
+    while True:
+        with app.app_context():
+            try:
+                start = time.perf_counter()
+                rows = rebuild_status_counts()
+                logger.info(f"Rebuilt {rows} ticket status counters in {time.perf_counter() - start:.2f}s")
+            except Exception as e:
+                logger.error(f"Status count reconciliation failed: {str(e)}\n{traceback.format_exc()}")
+                db.session.rollback()
+        time.sleep(settings.STATUS_COUNT_RECONCILE_SECONDS)
@@ -0,0 +1,67 @@
+"""
+Per-process cache of the ticket details served to the chat on join.
+
+core.ticket_writer drops a ticket's entry whenever it updates the row. Once the
+transaction commits, the entry is dropped again (in case it was reloaded before the
+commit) and, with several processes, in every other process through
+core.cache_invalidation, so no worker serves details older than a committed write.
+"""
+from sqlalchemy import event
+
+from core import cache_invalidation
+from core.config import settings
+from core.database import db
+from core.models import Ticket
+from utils.ttl_cache import TTLCache
+
+_PENDING = "ticket_cache_pending_invalidations"
+
+_details = TTLCache(settings.TICKET_CACHE_MAX_ENTRIES, settings.TICKET_CACHE_TTL_SECONDS)
+cache_invalidation.register("ticket", _details.pop, _details.clear)
+
+def ticket_details(ticket: Ticket) -> dict:
+    return {
+        'id': ticket.sys_id,
+        'user_id': ticket.user_id,
+        'description': ticket.description,
+        'status': ticket.status,
+        'priority': ticket.priority,
+        'team': ticket.classified_team,
+        'resolution': ticket.l2_resolution,
+        'created_at': ticket.created_at.isoformat() if ticket.created_at else None,
+        'updated_at': ticket.updated_at.isoformat() if ticket.updated_at else None,
+        'classified_team': ticket.classified_team,
+        'source': ticket.source,
+        'rca': ticket.rca,
+        'pm': ticket.pm
+    }
+
+def get_ticket_details(sys_id: str):
+    """
+    Ticket details for the chat, from the cache or the database.
+
+    Returns:
+        dict: The ticket details, or None if no ticket has this sys_id
+    """
+    details = _details.get(sys_id)
+    if details is None:
+        ticket = Ticket.query.filter_by(sys_id=sys_id).first()
+        if ticket is None:
+            return None
+        details = ticket_details(ticket)
+        _details.set(sys_id, details)
+    return details
+
+def invalidate_ticket(sys_id: str):
+    """Drop a ticket's entry now and, once the current transaction commits, in every process."""
+    _details.pop(sys_id)
+    db.session().info.setdefault(_PENDING, set()).add(sys_id)
+
+@event.listens_for(db.session, "after_commit")
+def _publish_invalidations(session):
+    for sys_id in session.info.pop(_PENDING, ()):
+        cache_invalidation.publish("ticket", sys_id)
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _discard_invalidations(session, previous_transaction):
+    session.info.pop(_PENDING, None)
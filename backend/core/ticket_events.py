@@ -0,0 +1,98 @@
+"""
+Coalesced `ticket_update` pushes over Socket.IO.
+
+core.ticket_writer records the columns each statement changed in the session; once
+the transaction commits they are merged into a per-ticket buffer. The first change
+to arrive schedules a flush TICKET_UPDATE_COALESCE_SECONDS later, so the status
+changes made by successive graph nodes go out as one frame. Each frame carries only
+the changed fields and the ticket version (its updated_at), and is sent to the
+ticket's `ticket:<sys_id>` room and its owner's `user:<id>` room, never broadcast.
+"""
+import threading
+from datetime import datetime
+
+from sqlalchemy import event
+
+from core.config import settings
+from core.database import db
+from core.status_counts import user_room
+from utils.logger import logger
+
+_PENDING = "ticket_update_pending"
+
+_socketio = None
+_buffer = {}                    # sys_id -> {"user_id", "version", "changes"}
+_buffer_lock = threading.Lock()
+_flush_scheduled = False
+
+def init_ticket_events(socketio):
+    """Publish committed ticket changes through this Socket.IO server."""
+    global _socketio
+    _socketio = socketio
+
+def ticket_room(sys_id: str) -> str:
+    return f"ticket:{sys_id}"
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def _merge(target: dict, update: dict):
+    entry = target.get(update["sys_id"])
+    if entry is None:
+        target[update["sys_id"]] = {
+            "user_id": update["user_id"], "version": update["version"], "changes": dict(update["changes"])
+        }
+        return
+    entry["changes"].update(update["changes"])
+    entry["version"] = max(entry["version"], update["version"])
+
+def record_ticket_update(row, columns):
+    """
+    Queue the given columns of an updated ticket row for publishing when the current
+    transaction of db.session commits.
+
+    Args:
+        row (Row): The ticket row as returned by the UPDATE
+        columns (iterable): Names of the columns the statement changed
+    """
+    pending = db.session().info.setdefault(_PENDING, {})
+    _merge(pending, {
+        "sys_id": row.sys_id,
+        "user_id": row.user_id,
+        "version": _json_value(row.updated_at),
+        "changes": {column: _json_value(getattr(row, column)) for column in columns}
+    })
+
+@event.listens_for(db.session, "after_commit")
+def _buffer_committed(session):
+    global _flush_scheduled
+    pending = session.info.pop(_PENDING, None)
+    if not pending or _socketio is None:
+        return
+    with _buffer_lock:
+        for sys_id, entry in pending.items():
+            _merge(_buffer, {"sys_id": sys_id, **entry})
+        if _flush_scheduled:
+            return
+        _flush_scheduled = True
+    _socketio.start_background_task(_flush_after_window)
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _discard_pending(session, previous_transaction):
+    session.info.pop(_PENDING, None)
+
+def _flush_after_window():
+    global _buffer, _flush_scheduled
+    _socketio.sleep(settings.TICKET_UPDATE_COALESCE_SECONDS)
+    with _buffer_lock:
+        frames, _buffer = _buffer, {}
+        _flush_scheduled = False
+    for sys_id, entry in frames.items():
+        try:
+            _socketio.emit("ticket_update", {
+                "ticket_id": sys_id,
+                "version": entry["version"],
+                "changes": entry["changes"]
+            }, to=[ticket_room(sys_id), user_room(entry["user_id"])])
+        except Exception as e:
+            logger.error(f"Error publishing ticket update for {sys_id}: {str(e)}")
@@ -0,0 +1,111 @@
+"""
+Single writer for the `tickets` row of a ticket being processed.
+
+Graph nodes only return field changes in TicketState; `persist_ticket_updates` wraps
+each node, diffs the state before and after it ran, and writes the changed columns
+with one `UPDATE ... WHERE sys_id` per graph step. API handlers use the same
+statements instead of loading the ticket, mutating it and committing. Every update
+drops the ticket from core.ticket_cache and is published by core.ticket_events once
+its transaction commits.
+"""
+from datetime import datetime
+from functools import wraps
+
+from sqlalchemy.dialects.postgresql import insert
+
+from core.database import db
+from core.models import Ticket
+from core.status_counts import adjust_status_counts
+from core.ticket_cache import invalidate_ticket
+from core.ticket_events import record_ticket_update
+from utils.logger import logger
+
+tickets = Ticket.__table__
+
+# TicketState key -> tickets column written when a node changes it
+STATE_COLUMNS = {
+    "status": "status",
+    "priority": "priority",
+    "classified_team": "classified_team",
+    "l2_is_new": "l2_is_new",
+    "resolution": "l2_resolution",
+    "l3_is_dev": "l3_is_dev",
+    "l3_resolution": "l3_resolution",
+    "l4_status": "l4_status"
+}
+
+def insert_ticket(**values) -> bool:
+    """
+    Insert a ticket unless one with the same sys_id exists (ON CONFLICT on the unique
+    sys_id index). Does not commit.
+
+    Returns:
+        bool: True if the ticket was inserted
+    """
+    statement = (
+        insert(tickets)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=[tickets.c.sys_id])
+        .returning(tickets.c.user_id, tickets.c.source, tickets.c.status)
+    )
+    row = db.session.execute(statement).first()
+    if row is None:
+        return False
+    adjust_status_counts([(row.user_id, row.source, None, row.status)])
+    return True
+
+def apply_ticket_updates(sys_id: str, updates: dict, user_id: int = None):
+    """
+    Write column updates to a ticket in one statement. Does not commit.
+
+    Args:
+        sys_id (str): Ticket ID
+        updates (dict): Column name -> value or SQL expression
+        user_id (int): Only update the ticket if it belongs to this user
+    Returns:
+        Row: The updated ticket row, or None if no ticket matched
+    """
+    previous = db.select(tickets.c.id, tickets.c.status).where(tickets.c.sys_id == sys_id)
+    if user_id is not None:
+        previous = previous.where(tickets.c.user_id == user_id)
+    previous = previous.with_for_update().cte("previous")
+    statement = (
+        tickets.update()
+        .where(tickets.c.id == previous.c.id)
+        .values(**updates, updated_at=datetime.utcnow())
+        .returning(*tickets.c, previous.c.status.label("previous_status"))
+    )
+    row = db.session.execute(statement).first()
+    invalidate_ticket(sys_id)
+    if row is None:
+        return None
+    if "status" in updates:
+        adjust_status_counts([(row.user_id, row.source, row.previous_status, row.status)])
+    record_ticket_update(row, updates)
+    return row
+
+def state_updates(before: dict, after: dict) -> dict:
+    """Column updates for the TicketState fields a node changed."""
+    return {
+        column: after[key]
+        for key, column in STATE_COLUMNS.items()
+        if key in after and after[key] != before.get(key)
+    }
+
+def persist_ticket_updates(node):
+    """Wrap a graph node so the ticket fields it changes are written and committed after it runs."""
+    @wraps(node)
+    def wrapper(state):
+        before = {key: state.get(key) for key in STATE_COLUMNS}
+        result = node(state)
+        updates = state_updates(before, result or {})
+        if updates:
+            try:
+                if apply_ticket_updates(state["ticket_id"], updates) is None:
+                    logger.warning(f"Ticket {state['ticket_id']} not found in database")
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        return result
+    return wrapper
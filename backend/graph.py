@@ -1,7 +1,5 @@
 from langgraph.graph import StateGraph, END, START
 from langgraph.checkpoint.postgres import PostgresSaver
-import psycopg
-from psycopg_pool import ConnectionPool
 from models.ticket_state import TicketState
 from nodes.l2_node import l2_node
 from nodes.analyser_node import analyser_node
@@ -12,35 +10,42 @@ from nodes.l3_node import l3_node
 from nodes.l4_node import l4_node
 from nodes.mail_node import mail_node
 from nodes.rca_pm_node import rca_pm_node
-from core.config import settings
+from core.pools import get_checkpoint_pool
+from core.node_telemetry import instrument_node
+from core.ticket_writer import persist_ticket_updates
 from utils.logger import logger
+import threading
 import traceback
 
+_graph = None
+_graph_lock = threading.Lock()
+
 def create_graph():
     try:
         graph = StateGraph(TicketState)
         
-        # Nodes
-        graph.add_node("rca_pm", rca_pm_node)
-        graph.add_node("l2_agent", l2_node)
-        graph.add_node("mail_l2", mail_node)
-        graph.add_node("analyser", analyser_node)
-        graph.add_node("more_info", more_info_node)
-        graph.add_node("mail_more_info", mail_node)
-        graph.add_node("feedback_agent", feedback_node)
-        graph.add_node("mail_feedback", mail_node)
-        graph.add_node("l3_l4_classifier", l3_l4_classifier_node)
-        graph.add_node("l3_agent", l3_node)
-        graph.add_node("mail_l3", mail_node)
-        graph.add_node("l4_agent", l4_node)
-        graph.add_node("mail_l4", mail_node)
+        # Nodes; the ticket fields a node changes are written to the tickets row after each step,
+        # and every run is measured by core.node_telemetry
+        graph.add_node("rca_pm", instrument_node("rca_pm", rca_pm_node))
+        graph.add_node("l2_agent", instrument_node("l2_agent", persist_ticket_updates(l2_node)))
+        graph.add_node("mail_l2", instrument_node("mail_l2", mail_node))
+        graph.add_node("analyser", instrument_node("analyser", persist_ticket_updates(analyser_node)))
+        graph.add_node("more_info", instrument_node("more_info", persist_ticket_updates(more_info_node)))
+        graph.add_node("mail_more_info", instrument_node("mail_more_info", mail_node))
+        graph.add_node("feedback_agent", instrument_node("feedback_agent", persist_ticket_updates(feedback_node)))
+        graph.add_node("mail_feedback", instrument_node("mail_feedback", mail_node))
+        graph.add_node("l3_l4_classifier", instrument_node("l3_l4_classifier", persist_ticket_updates(l3_l4_classifier_node)))
+        graph.add_node("l3_agent", instrument_node("l3_agent", persist_ticket_updates(l3_node)))
+        graph.add_node("mail_l3", instrument_node("mail_l3", mail_node))
+        graph.add_node("l4_agent", instrument_node("l4_agent", persist_ticket_updates(l4_node)))
+        graph.add_node("mail_l4", instrument_node("mail_l4", mail_node))
         
         # Edges
         # Fan-out from START to both rca_pm and l2_agent
         graph.add_edge(START, "rca_pm")
         graph.add_edge(START, "l2_agent")
         
-        # rca_pm branch ends
+        # rca_pm only queues background enrichment, so this branch ends immediately
         graph.add_edge("rca_pm", END)
         
         # l2_agent branch continues
@@ -80,23 +85,10 @@ def create_graph():
         graph.add_edge("l4_agent", "mail_l4")
         graph.add_edge("mail_l4", END)
         
-        # Persistence
-        conninfo = settings.DATABASE_URL
-        logger.info(f"Setting up PostgresSaver with conninfo: {conninfo}")
-        pool = ConnectionPool(conninfo)
-        try:
-            with psycopg.connect(
-                conninfo,
-                autocommit=True
-            ) as setup_conn:
-                memory = PostgresSaver(setup_conn)
-                memory.setup()
-                logger.info("PostgresSaver setup completed successfully")
-        except psycopg.Error as e:
-            logger.error(f"Failed to set up PostgresSaver: {str(e)}\n{traceback.format_exc()}")
-            raise
-        
-        checkpointer = PostgresSaver(pool)
+        # Persistence; the saver shares the process-wide checkpoint pool
+        checkpointer = PostgresSaver(get_checkpoint_pool())
+        checkpointer.setup()
+        logger.info("PostgresSaver setup completed successfully")
         
         compiled_graph = graph.compile(
             checkpointer=checkpointer,
@@ -106,4 +98,13 @@ def create_graph():
         return compiled_graph
     except Exception as e:
         logger.error(f"Error creating graph: {str(e)}\n{traceback.format_exc()}")
-        raise
\ No newline at end of file
+        raise
+
+def get_graph():
+    """The compiled ticket graph for this process, built on first use."""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = create_graph()
+    return _graph
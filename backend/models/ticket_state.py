@@ -12,9 +12,13 @@ class TicketState(TypedDict):
     created_at: Optional[datetime]
     l3_is_dev: Optional[bool]
     l3_resolution: Optional[str]
+    l4_status: Optional[str]
     l2_count: int                      # Tracks how many times the ticket has been processed by L2
     combined_score: Optional[float]    # Combined score from L2 agent
     priority: Optional[str]            # Priority from L2 agent
     classified_team: Optional[str]     # Classified team from L2 agent
     resolution: Optional[str]          # Resolution from L2 agent
-    additional_info: Optional[str]     # Additional info provided by the user
\ No newline at end of file
+    additional_info: Optional[str]     # Additional info provided by the user
+    cluster_id: Optional[int]          # Incident cluster assigned at ingestion
+    cluster_leader: Optional[bool]     # Leaders run L2/RCA for their cluster; followers inherit the results
+    inherited_prediction: Optional[dict]  # Leader's L2 prediction, used for a follower's first L2 pass
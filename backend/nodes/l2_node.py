@@ -1,8 +1,7 @@
 from models.ticket_state import TicketState
 from agents.l2_agent import predict
+from core.incident_clusters import record_cluster_prediction
 from utils.logger import logger
-from core.models import Ticket
-from core.database import db
 import traceback
 
 def l2_node(state: TicketState) -> TicketState:
@@ -16,7 +15,14 @@ def l2_node(state: TicketState) -> TicketState:
         else:
             combined_input = f"{state['description']} User: {user_input}"
         
-        result = predict(combined_input)
+        first_pass = not state.get("l2_count")
+        if first_pass and state.get("inherited_prediction"):
+            # Follower of an incident cluster: reuse the leader's prediction (and so its email)
+            result = state["inherited_prediction"]
+        else:
+            result = predict(combined_input)
+            if first_pass and state.get("cluster_leader"):
+                record_cluster_prediction(state["cluster_id"], result)
       
         logger.info(f"Predict result for {state['ticket_id']}: {result}")
         state["priority"] = result["Priority"]
@@ -26,18 +32,6 @@ def l2_node(state: TicketState) -> TicketState:
         state["l2_count"] = state.get("l2_count", 0) + 1
         state["status"] = "l2_processed"
         state["l2_is_new"] = result["is_new_issue"]
-        
-        ticket = Ticket.query.filter_by(sys_id=state["ticket_id"]).first()
-        if ticket:
-            ticket.l2_is_new = state["l2_is_new"]
-            ticket.l2_resolution = state["resolution"]
-            ticket.status = state["status"]
-            ticket.priority = state["priority"]
-            ticket.classified_team = state["classified_team"]
-            db.session.commit()
-            logger.info(f"Updated ticket {state['ticket_id']} in database")
-        else:
-            logger.warning(f"Ticket {state['ticket_id']} not found in database")
     except Exception as e:
         logger.error(f"L2 Node Error for ticket {state['ticket_id']}: {str(e)}\n{traceback.format_exc()}")
     return state
\ No newline at end of file
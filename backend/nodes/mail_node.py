@@ -1,10 +1,10 @@
 from models.ticket_state import TicketState
-from agents.mail_agent import send_email
+from agents.mail_agent import enqueue_email
 from utils.logger import logger
 
 def mail_node(state: TicketState) -> TicketState:
     """
-    Node to send email notifications based on ticket status.
+    Node to queue email notifications based on ticket status; the mail dispatcher delivers them.
     
     Args:
         state (TicketState): Current ticket state
@@ -22,7 +22,7 @@ def mail_node(state: TicketState) -> TicketState:
             "resolution": state.get("resolution")
         }
         
-        send_email(
+        enqueue_email(
             to_email=user_email,
             ticket_id=ticket_id,
             status=status,
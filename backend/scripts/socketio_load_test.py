@@ -0,0 +1,71 @@
+"""
+Socket.IO load test: connect increasing numbers of clients, join a ticket chat and
+report join latency and throughput per step.
+
+Run it once against a single worker and again against several (one --url each, or
+one load-balanced --url). With the backplane enabled, joins/s should grow with the
+worker count and latency should stay flat as the client count grows.
+
+    python scripts/socketio_load_test.py --url http://localhost:8083 --url http://localhost:8084 \\
+        --token "$ACCESS_TOKEN" --ticket INC0010001 --clients 100,200,400,800
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import socketio
+
+def run_client(url: str, token: str, ticket_id: str, timeout: float):
+    """Connect, join the ticket and wait for its details. Returns (client, join latency or None)."""
+    client = socketio.Client(reconnection=False)
+    joined = threading.Event()
+    client.on("message", lambda data: data.get("type") == "ticket_details" and joined.set())
+    try:
+        client.connect(url, transports=["websocket"], auth={"token": token}, wait_timeout=timeout)
+        start = time.perf_counter()
+        client.emit("join", {"ticket_id": ticket_id})
+        if not joined.wait(timeout):
+            return client, None
+        return client, time.perf_counter() - start
+    except socketio.exceptions.ConnectionError:
+        return client, None
+
+def run_step(urls: list, token: str, ticket_id: str, clients: int, concurrency: int, timeout: float) -> dict:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(
+            lambda i: run_client(urls[i % len(urls)], token, ticket_id, timeout), range(clients)
+        ))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for _, latency in results if latency is not None)
+    for client, _ in results:
+        client.disconnect()
+    return {
+        "clients": clients,
+        "joined": len(latencies),
+        "joins_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", action="append", required=True, help="Server URL; repeat to spread clients")
+    parser.add_argument("--token", required=True, help="Access token of the ticket's owner")
+    parser.add_argument("--ticket", required=True, help="sys_id of a ticket owned by the token's user")
+    parser.add_argument("--clients", default="100,200,400,800", help="Comma-separated client counts")
+    parser.add_argument("--concurrency", type=int, default=50, help="Clients connecting at the same time")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds to wait for connect and join")
+    args = parser.parse_args()
+
+    print(f"{'clients':>8} {'joined':>8} {'joins/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for clients in (int(n) for n in args.clients.split(",")):
+        step = run_step(args.url, args.token, args.ticket, clients, args.concurrency, args.timeout)
+        p50 = f"{step['p50_ms']:.1f}" if step["p50_ms"] is not None else "-"
+        p95 = f"{step['p95_ms']:.1f}" if step["p95_ms"] is not None else "-"
+        print(f"{step['clients']:>8} {step['joined']:>8} {step['joins_per_second']:>10.1f} {p50:>8} {p95:>8}")
+
+if __name__ == "__main__":
+    main()
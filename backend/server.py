@@ -1,14 +1,44 @@
+"""
+Backend entry point.
+
+Single process (development):
+    python server.py
+
+Several workers and hosts (SOCKETIO_MESSAGE_QUEUE=postgres and the default
+CHAT_MEMORY_BACKEND=postgres, so rooms, emits and chat threads are shared):
+    SOCKETIO_MESSAGE_QUEUE=postgres gunicorn -k eventlet -w 4 -b 0.0.0.0:8083 server:app
+
+Run the same command on every host behind the load balancer. The frontend connects with
+the websocket transport only, so neither gunicorn nor the balancer needs sticky sessions
+(long-polling clients would). Each worker opens its own pools and background loops; size DB_POOL_* and
+CHECKPOINT_POOL_* for the total number of processes (see core.pools).
+"""
+import eventlet
+eventlet.monkey_patch()
+
 from flask import Flask
 from flask_cors import CORS
 from flask_socketio import SocketIO
 from api.auth_api import auth_api
+from api.admin_api import admin_api
+from api.metrics_api import metrics_api
 from api.incidents_api import incident_api, init_socketio
+from core.cache_invalidation import run_invalidation_listener
 from core.database import init_db
+from core.incident_clusters import run_cluster_pruner
+from core.job_queue import start_job_workers
+from core.checkpoint_retention import run_checkpoint_retention
+from core.socketio_backplane import socketio_queue_options
+from core.status_counts import init_status_counts, run_status_count_reconciler
+from core.ticket_events import init_ticket_events
 from core.config import settings
+from agents.l2_agent import vector_index
+from agents.rca_pm_agent import init_rca_pm
+from agents.mail_dispatcher import run_mail_dispatcher
 
 def create_app():
     app = Flask(__name__)
-    CORS(app, resources={r"/*": {"origins": ["http://localhost:5173", "*"]}})  
+    CORS(app, resources={r"/*": {"origins": ["http://localhost:5173", "*"]}}, expose_headers=["X-Next-Cursor"])  
     
     app.config["SECRET_KEY"] = settings.JWT_SECRET_KEY
     app.config["SQLALCHEMY_DATABASE_URI"] = settings.DATABASE_URL
@@ -18,13 +48,27 @@ def create_app():
     
     app.register_blueprint(auth_api)
     app.register_blueprint(incident_api)
+    app.register_blueprint(admin_api)
+    app.register_blueprint(metrics_api)
     
     return app
 
 app = create_app()
-socketio = SocketIO(app, async_mode='eventlet', cors_allowed_origins=["http://localhost:5173", "*"])
+socketio = SocketIO(
+    app, async_mode='eventlet', cors_allowed_origins=["http://localhost:5173", "*"], **socketio_queue_options()
+)
 
 init_socketio(socketio)
+init_rca_pm(app)
+init_status_counts(socketio)
+init_ticket_events(socketio)
+start_job_workers(app, socketio)
+socketio.start_background_task(vector_index.run_forever, app, settings.FAISS_INGEST_FLUSH_SECONDS)
+socketio.start_background_task(run_mail_dispatcher, app)
+socketio.start_background_task(run_status_count_reconciler, app)
+socketio.start_background_task(run_checkpoint_retention, app)
+socketio.start_background_task(run_cluster_pruner, app)
+socketio.start_background_task(run_invalidation_listener)
 
 if __name__ == "__main__":
     # logger.info("Starting the Flask server with eventlet...")
@@ -0,0 +1,76 @@
+"""
+Minimal local stand-in for the Mailgun messages API, for tests and local runs.
+
+    python -m utils.mailgun_stub --port 8025 [--fail-every 3]
+
+Then set MAILGUN_API_BASE_URL=http://localhost:8025/v3. Every accepted message is
+printed as one JSON line; --fail-every N answers every Nth request with a 500 so the
+dispatcher's retry path can be exercised.
+"""
+import argparse
+import itertools
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+class MailgunStubHandler(BaseHTTPRequestHandler):
+    fail_every = 0
+    counter = itertools.count(1)
+    lock = threading.Lock()
+    messages = []
+
+    def _respond(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        if not self.path.endswith("/messages"):
+            self._respond(404, {"message": "Not found"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        with self.lock:
+            count = next(self.counter)
+        if self.fail_every and count % self.fail_every == 0:
+            self._respond(500, {"message": "Simulated failure"})
+            return
+        message = {
+            "id": f"<{uuid.uuid4().hex}@mailgun-stub>",
+            "to": form.get("to", []),
+            "subject": form.get("subject", [""])[0],
+            "recipient_variables": json.loads(form.get("recipient-variables", ["{}"])[0])
+        }
+        with self.lock:
+            self.messages.append(message)
+        print(json.dumps(message), flush=True)
+        self._respond(200, {"id": message["id"], "message": "Queued. Thank you."})
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(host: str = "127.0.0.1", port: int = 8025, fail_every: int = 0) -> ThreadingHTTPServer:
+    """Start the stub in a background thread and return the server (call shutdown() to stop)."""
+    MailgunStubHandler.fail_every = fail_every
+    server = ThreadingHTTPServer((host, port), MailgunStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Mailgun API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--fail-every", type=int, default=0)
+    args = parser.parse_args()
+    MailgunStubHandler.fail_every = args.fail_every
+    server = ThreadingHTTPServer((args.host, args.port), MailgunStubHandler)
+    print(f"Mailgun stub listening on http://{args.host}:{args.port}/v3", flush=True)
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Small in-process metrics registry (counters and histograms with labels).
+
+Metrics are created once at import time with `counter(...)` / `histogram(...)` and
+updated from any thread; `snapshot()` returns their current values and
+`render_prometheus()` the Prometheus text format served at /metrics.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels: tuple = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0, "max": 0.0}
+            series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+            series["max"] = max(series["max"], value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def values(self) -> dict:
+        with self._lock:
+            return {key: {**series, "counts": list(series["counts"])} for key, series in self._values.items()}
+
+def _register(metric):
+    with _registry_lock:
+        existing = _registry.get(metric.name)
+        if existing is not None:
+            return existing
+        _registry[metric.name] = metric
+        return metric
+
+def counter(name: str, description: str, labels: tuple = ()) -> Counter:
+    return _register(Counter(name, description, labels))
+
+def histogram(name: str, description: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, description, labels, buckets))
+
+def snapshot(prefix: str = "") -> dict:
+    """Current values of every registered metric whose name starts with prefix."""
+    with _registry_lock:
+        metrics = [metric for name, metric in _registry.items() if name.startswith(prefix)]
+    result = {}
+    for metric in metrics:
+        series = []
+        for key, value in metric.values().items():
+            labels = dict(zip(metric.labels, key))
+            if metric.kind == "histogram":
+                series.append({
+                    "labels": labels,
+                    "count": value["count"],
+                    "sum": value["sum"],
+                    "max": value["max"],
+                    "avg": value["sum"] / value["count"] if value["count"] else 0.0
+                })
+            else:
+                series.append({"labels": labels, "value": value})
+        result[metric.name] = {"type": metric.kind, "description": metric.description, "series": series}
+    return result
+
+def _prometheus_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+def render_prometheus() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda metric: metric.name)
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for key, value in sorted(metric.values().items()):
+            labels = dict(zip(metric.labels, key))
+            if metric.kind == "counter":
+                lines.append(f"{metric.name}{_prometheus_labels(labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (float("inf"),), value["counts"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{metric.name}_bucket{_prometheus_labels({**labels, 'le': le})} {cumulative}")
+            lines.append(f"{metric.name}_sum{_prometheus_labels(labels)} {value['sum']}")
+            lines.append(f"{metric.name}_count{_prometheus_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
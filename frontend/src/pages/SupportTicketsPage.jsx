@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate, Link as RouterLink } from 'react-router-dom';
 import {
   Container,
@@ -126,16 +126,17 @@ const SupportTicketsPage = () => {
   const [tickets, setTickets] = useState([]);
   const [filteredTickets, setFilteredTickets] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
   const [error, setError] = useState(null);
   const [searchTerm, setSearchTerm] = useState('');
   const [statusFilter, setStatusFilter] = useState('all');
   const [priorityFilter, setPriorityFilter] = useState('all');
   const [sourceFilter, setSourceFilter] = useState('all');
-  const [stats, setStats] = useState({
-    open: 0,
-    inProgress: 0,
-    resolved: 0,
-  });
+  // Status -> ticket count for the selected source, loaded once and kept current by pushed deltas
+  const [statusCounts, setStatusCounts] = useState({});
+  const [countsLoading, setCountsLoading] = useState(true);
+  const sourceFilterRef = useRef(sourceFilter);
 
   const sources = ['servicenow', 'jira', 'all'];
   const [sourceIndex, setSourceIndex] = useState(2); // Default to 'all'
@@ -150,19 +151,18 @@ const SupportTicketsPage = () => {
     setSourceFilter(sources[sourceIndex === sources.length - 1 ? 0 : sourceIndex + 1]);
   };
 
-  const calculateStats = (ticketList) => {
-    const openCount = ticketList.filter((t) =>
-      ['more_info_needed', 'feedback_needed', 'passed to l3, processing', 'passed to l4, processing']
-        .includes(t.status?.toLowerCase())
-    ).length;
-    const inProgressCount = ticketList.filter(
-      (t) =>
-        (t.status?.toLowerCase().includes('progress') ||
-         t.status?.toLowerCase().includes('l3') ||
-         t.status?.toLowerCase().includes('l4')) &&
-        !['passed to l3, processing', 'passed to l4, processing'].includes(t.status?.toLowerCase())
-    ).length;
-    const resolvedCount = ticketList.filter((t) => t.status?.toLowerCase() === 'resolved').length;
+  const calculateStats = (counts) => {
+    const countWhere = (predicate) =>
+      Object.entries(counts).reduce((total, [status, count]) => (predicate(status) ? total + count : total), 0);
+    const openCount = countWhere((s) =>
+      ['more_info_needed', 'feedback_needed', 'passed to l3, processing', 'passed to l4, processing'].includes(s)
+    );
+    const inProgressCount = countWhere(
+      (s) =>
+        (s.includes('progress') || s.includes('l3') || s.includes('l4')) &&
+        !['passed to l3, processing', 'passed to l4, processing'].includes(s)
+    );
+    const resolvedCount = countWhere((s) => s === 'resolved');
     return {
       open: openCount,
       inProgress: inProgressCount,
@@ -170,20 +170,66 @@ const SupportTicketsPage = () => {
     };
   };
 
+  const stats = calculateStats(statusCounts);
+
+  const loadStatusCounts = async (source) => {
+    try {
+      setCountsLoading(true);
+      const counts = await ticketService.getTicketStateCount('all', source);
+      if (sourceFilterRef.current === source) {
+        setStatusCounts(counts);
+      }
+    } catch (err) {
+      console.error('Failed to fetch ticket state counts:', err);
+      setStatusCounts({});
+    } finally {
+      setCountsLoading(false);
+    }
+  };
+
+  useEffect(() => {
+    sourceFilterRef.current = sourceFilter;
+    loadStatusCounts(sourceFilter);
+  }, [sourceFilter]);
+
+  useEffect(() => {
+    // Counts change by pushed deltas instead of polling; reload on reconnect to cover missed ones
+    const unsubscribe = ticketService.subscribeTicketStateCount(
+      (changes) => {
+        const source = sourceFilterRef.current;
+        setStatusCounts((prev) => {
+          const next = { ...prev };
+          changes
+            .filter((change) => source === 'all' || change.source === source)
+            .forEach(({ status, delta }) => {
+              next[status] = (next[status] || 0) + delta;
+            });
+          return next;
+        });
+      },
+      () => loadStatusCounts(sourceFilterRef.current)
+    );
+    return unsubscribe;
+  }, []);
+
+  const sortTickets = (ticketList) =>
+    [...ticketList].sort((a, b) => new Date(b.updated_at || b.created_at) - new Date(a.updated_at || a.created_at));
+
   useEffect(() => {
     const fetchTicketsAndStats = async () => {
       try {
         setLoading(true);
-        const ticketsData = await ticketService.getTickets();
-        const sortedTickets = ticketsData.sort((a, b) => new Date(b.updated_at || b.created_at) - new Date(a.updated_at || a.created_at));
+        // Only the first page; later pages are fetched on "Load more"
+        const { tickets: ticketsData, nextCursor: cursor } = await ticketService.getTickets();
+        const sortedTickets = sortTickets(ticketsData);
         setTickets(sortedTickets);
-        setStats(calculateStats(sortedTickets));
+        setNextCursor(cursor);
         setError(null);
       } catch (err) {
         console.error('Failed to fetch tickets:', err);
         setError('Failed to load tickets. Please try again later.');
         setTickets([]);
-        setStats({ open: 0, inProgress: 0, resolved: 0 });
+        setNextCursor(null);
       } finally {
         setLoading(false);
       }
@@ -191,6 +237,24 @@ const SupportTicketsPage = () => {
     fetchTicketsAndStats();
   }, []);
 
+  const handleLoadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const { tickets: ticketsData, nextCursor: cursor } = await ticketService.getTickets(nextCursor);
+      setTickets((prev) => {
+        const seen = new Set(prev.map((t) => t.ticket_id));
+        return sortTickets([...prev, ...ticketsData.filter((t) => !seen.has(t.ticket_id))]);
+      });
+      setNextCursor(cursor);
+    } catch (err) {
+      console.error('Failed to fetch more tickets:', err);
+      setError('Failed to load more tickets. Please try again later.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     let currentTickets = [...tickets];
     if (sourceFilter !== 'all') {
@@ -210,7 +274,6 @@ const SupportTicketsPage = () => {
       currentTickets = currentTickets.filter((ticket) => ticket.priority?.toLowerCase() === priorityFilter.toLowerCase());
     }
     setFilteredTickets(currentTickets);
-    setStats(calculateStats(currentTickets));
   }, [searchTerm, statusFilter, priorityFilter, sourceFilter, tickets]);
 
   const uniqueStatuses = ['all', ...new Set(tickets.map((t) => t.status?.toLowerCase()).filter(Boolean))];
@@ -249,7 +312,7 @@ const SupportTicketsPage = () => {
             title="Open Tickets"
             value={stats.open}
             icon={<OpenTicketIconMui sx={{ fontSize: '2.5rem' }} />}
-            loading={loading}
+            loading={countsLoading}
           />
         </Box>
         <Box
@@ -262,7 +325,7 @@ const SupportTicketsPage = () => {
             title="Resolved Tickets"
             value={stats.resolved}
             icon={<ResolvedIconMui sx={{ fontSize: '2.5rem' }} />}
-            loading={loading}
+            loading={countsLoading}
           />
         </Box>
       </Box>
@@ -409,6 +472,20 @@ const SupportTicketsPage = () => {
           </Table>
         </TableContainer>
       )}
+
+      {!loading && !error && nextCursor && (
+        <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+          <Button
+            variant="outlined"
+            onClick={handleLoadMore}
+            disabled={loadingMore}
+            startIcon={loadingMore ? <CircularProgress size={16} /> : null}
+            sx={{ textTransform: 'none' }}
+          >
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </Button>
+        </Box>
+      )}
     </Container>
   );
 };
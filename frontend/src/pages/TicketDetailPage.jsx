@@ -58,6 +58,7 @@ const TicketDetailPage = () => {
     socket.current = io(`${config.api.baseUrl}`, {
       transports: ['websocket'],
       withCredentials: true,
+      auth: { token: localStorage.getItem('accessToken') },
     });
 
     socket.current.on('connect', () => {
@@ -69,10 +70,35 @@ const TicketDetailPage = () => {
         setTicket(data.ticket);
         sendInitialMessage(data.ticket);
       } else if (data.type === 'text') {
-        setMessages((prev) => [...prev, { sender: 'bot', text: data.text }]);
+        // The final message replaces the chunks streamed for the same reply
+        setMessages((prev) => {
+          const last = prev[prev.length - 1];
+          if (last && data.message_id && last.streamId === data.message_id) {
+            return [...prev.slice(0, -1), { sender: 'bot', text: data.text }];
+          }
+          return [...prev, { sender: 'bot', text: data.text }];
+        });
       }
     });
 
+    socket.current.on('message_chunk', (data) => {
+      setMessages((prev) => {
+        const last = prev[prev.length - 1];
+        if (last && last.streamId === data.message_id) {
+          return [...prev.slice(0, -1), { ...last, text: last.text + data.text }];
+        }
+        return [...prev, { sender: 'bot', text: data.text, streamId: data.message_id }];
+      });
+    });
+
+    // Only the changed columns are sent; merge them into the loaded ticket
+    socket.current.on('ticket_update', (data) => {
+      if (data.ticket_id !== ticketId) return;
+      const { feedback, ...changes } = data.changes;
+      if (feedback !== undefined) changes.user_feedback = feedback;
+      setTicket((prev) => (prev ? { ...prev, ...changes } : prev));
+    });
+
     socket.current.on('error', (data) => {
       console.error('Socket error:', data.message);
       setMessages((prev) => [
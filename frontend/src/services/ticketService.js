@@ -1,17 +1,20 @@
+import io from 'socket.io-client';
 import config from '../config';
 import api from './api';
 
 export const ticketService = {
-  async getTickets() {
+  async getTickets(cursor = null) {
     try {
-      const response = await api.get(`${config.api.baseUrl}/api/incidents`);
+      // The endpoint is keyset-paginated; X-Next-Cursor is absent on the last page
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await api.get(`${config.api.baseUrl}/api/incidents${query}`);
       const data = await response.json();
       
       if (!response.ok) {
         throw new Error(data.error || "Failed to fetch tickets");
       }
       
-      return data;
+      return { tickets: data, nextCursor: response.headers.get("X-Next-Cursor") };
     } catch (error) {
       throw error;
     }
@@ -105,10 +108,13 @@ export const ticketService = {
     }
   },
 
-  async getTicketStateCount(state = 'all') {
+  async getTicketStateCount(state = 'all', source = 'all') {
     try {
-      const url = `${config.api.baseUrl}/api/ticket-state-count${state !== 'all' ? `?state=${encodeURIComponent(state)}` : ''}`;
-      const response = await api.get(url);
+      const params = new URLSearchParams();
+      if (state !== 'all') params.set('state', state);
+      if (source !== 'all') params.set('source', source);
+      const query = params.toString();
+      const response = await api.get(`${config.api.baseUrl}/api/ticket-state-count${query ? `?${query}` : ''}`);
       const data = await response.json();
       if (!response.ok) {
         throw new Error(data.error || "Failed to fetch ticket state count");
@@ -117,6 +123,22 @@ export const ticketService = {
     } catch (error) {
       throw new Error(error.message || "Failed to fetch ticket state count");
     }
+  },
+
+  // Counts are pushed as ticket_state_count deltas to the user's room, which the
+  // server joins when the access token is sent in the auth payload. onConnect runs
+  // on every (re)connect so callers can reload the counts deltas may have been missed for.
+  subscribeTicketStateCount(onChanges, onConnect) {
+    const socket = io(`${config.api.baseUrl}`, {
+      transports: ['websocket'],
+      withCredentials: true,
+      auth: { token: localStorage.getItem('accessToken') },
+    });
+    if (onConnect) {
+      socket.on('connect', onConnect);
+    }
+    socket.on('ticket_state_count', (data) => onChanges(data?.changes || []));
+    return () => socket.disconnect();
   }
 };
 